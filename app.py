@@ -1,774 +1,2186 @@
-import streamlit as st
-import pandas as pd
-import datetime
-import base64
-import json
-import gspread
-import os
-import io
-import time
-import urllib.parse
-from PIL import Image
-from google.oauth2.service_account import Credentials
-from gspread.exceptions import WorksheetNotFound, APIError
-
-# --- 1. 系統設定 ---
-st.set_page_config(page_title="TIM TEAM 2026", page_icon="🦁", layout="wide", initial_sidebar_state="expanded")
-
-# --- Custom CSS ---
-st.markdown("""
-<style>
-    [data-testid="stAppViewContainer"] { background-color: #f8f9fa !important; } 
-    [data-testid="stSidebar"] { background-color: #ffffff !important; border-right: 1px solid #e9ecef; }
-    [data-testid="stHeader"] { background-color: rgba(0,0,0,0) !important; }
-    h1, h2, h3, h4, h5, h6, p, div, span, label, li, .stMarkdown, .stText { color: #2c3e50 !important; font-family: 'Helvetica Neue', sans-serif; }
-    h1, h2, h3 { color: #C5A028 !important; font-weight: 800 !important; letter-spacing: 0.5px; }
-
-    div[role="radiogroup"] > label > div:first-child { display: none !important; }
-    div[role="radiogroup"] label {
-        background-color: #ffffff !important; padding: 12px 15px !important; margin-bottom: 8px !important;
-        border-radius: 10px !important; border: 1px solid #e9ecef !important;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.03) !important; transition: all 0.3s ease !important; width: 100% !important;
-    }
-    div[role="radiogroup"] label:hover {
-        border-color: #D4AF37 !important; background-color: #FFF8E1 !important;
-        transform: translateX(5px); box-shadow: 0 4px 8px rgba(212, 175, 55, 0.2) !important;
-    }
-
-    div[data-testid="stMetric"], div.css-1r6slb0, .stContainer, div[data-testid="stExpander"] { background-color: #ffffff !important; border: 1px solid #e0e0e0 !important; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.05); transition: all 0.3s ease; }
-    .stTextInput > div > div > input, .stTextArea > div > div > textarea, .stDateInput > div > div > input, .stSelectbox > div > div { background-color: #fdfdfd !important; border: 1px solid #dce4ec !important; border-radius: 8px; }
-    div.stButton > button { background: linear-gradient(135deg, #D4AF37 0%, #B38F21 100%) !important; color: #FFFFFF !important; border: none; border-radius: 8px; font-weight: 600; letter-spacing: 1px; box-shadow: 0 4px 10px rgba(212, 175, 55, 0.3); width: 100%;}
-    img { border-radius: 50%; }
-
-    .admin-edit-box { border: 2px dashed #C5A028; padding: 15px; border-radius: 10px; background-color: #fffdf0; margin-top: 15px; }
-
-    .activity-card { background-color: #ffffff; border-radius: 12px; padding: 16px; margin-bottom: 12px; border-left: 5px solid #e9ecef; box-shadow: 0 2px 8px rgba(0,0,0,0.05); transition: transform 0.2s;}
-    .activity-card:hover { transform: translateY(-2px); box-shadow: 0 5px 15px rgba(0,0,0,0.1); }
-    .card-signed { border-left-color: #D4AF37 !important; } 
-    .card-meeting { border-left-color: #3498db !important; }
-    .card-recruit { border-left-color: #9b59b6 !important; } 
-    .card-admin { border-left-color: #95a5a6 !important; }
-    .act-header { display: flex; justify-content: space-between; align-items: center; margin-bottom: 8px; }
-    .act-avatar { width: 40px; height: 40px; border-radius: 50%; object-fit: cover; margin-right: 10px; border: 2px solid #f0f0f0;}
-    .act-name { font-weight: bold; color: #2c3e50; }
-    .act-time { font-size: 0.85em; color: #95a5a6; }
-    .act-badge { padding: 4px 10px; border-radius: 12px; font-size: 0.8em; font-weight: 600; letter-spacing: 0.5px; }
-    .badge-signed { background-color: #FFF8E1; color: #D4AF37; border: 1px solid #D4AF37; }
-    .badge-meeting { background-color: #ebf5fb; color: #3498db; border: 1px solid #3498db; }
-    .badge-recruit { background-color: #f4ecf7; color: #9b59b6; border: 1px solid #9b59b6; }
-    .badge-default { background-color: #f8f9fa; color: #7f8c8d; border: 1px solid #bdc3c7; }
-    .act-content { background-color: #f8f9fa; padding: 10px; border-radius: 8px; color: #555; font-size: 0.95em; line-height: 1.5; margin-top: 5px;}
-
-    .reward-card-premium { 
-        background: linear-gradient(145deg, #ffffff, #fffdf5); 
-        border: 2px solid #D4AF37; 
-        border-radius: 16px; padding: 25px 20px; text-align: center; 
-        box-shadow: 0 10px 25px rgba(212, 175, 55, 0.15); 
-        transition: all 0.3s ease; height: 100%; position: relative; overflow: hidden; 
-    }
-    .reward-card-premium::before { content: ""; position: absolute; top: 0; left: 0; width: 100%; height: 8px; background: linear-gradient(90deg, #D4AF37, #FDC830, #D4AF37); }
-    .reward-card-premium:hover { transform: translateY(-5px); box-shadow: 0 15px 35px rgba(212, 175, 55, 0.3); }
-    .reward-icon { font-size: 3em; margin-bottom: 15px; display: block; filter: drop-shadow(0 2px 2px rgba(0,0,0,0.1)); }
-    .reward-title-p { color: #D4AF37; font-size: 1.3em; font-weight: 800; margin-bottom: 10px; text-transform: uppercase; letter-spacing: 1.5px; }
-    .reward-prize-p { color: #c0392b; font-size: 1.6em; font-weight: 900; margin-bottom: 10px; text-shadow: 1px 1px 0px rgba(0,0,0,0.05); }
-    .reward-desc-p { color: #7f8c8d; font-size: 0.9em; line-height: 1.4; font-weight: 500; }
-    .challenge-header-box { background: linear-gradient(to right, #FFF8E1, #FFFFFF); border-left: 6px solid #D4AF37; padding: 25px; border-radius: 12px; box-shadow: 0 4px 15px rgba(0,0,0,0.05); margin-bottom: 25px; }
-    
-    /* 彈藥庫專用標籤 */
-    .ammo-nightmare { background-color: #fdedec; border-left: 4px solid #e74c3c; padding: 15px; border-radius: 5px; margin-bottom: 10px; }
-    .ammo-dream { background-color: #eafaf1; border-left: 4px solid #2ecc71; padding: 15px; border-radius: 5px; margin-bottom: 10px; }
-</style>
-""", unsafe_allow_html=True)
-
-# 離職成員黑名單
-INACTIVE_MEMBERS = ['Wilson', 'Catherine', 'Maggie']
-
-# Google Sheets 設定
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-
-@st.cache_resource
-def get_gs_client():
-    try:
-        if "service_account" in st.secrets:
-            json_str = st.secrets["service_account"]["key_content"]
-            key_dict = json.loads(json_str)
-        elif "GSPREAD_KEY" in os.environ:
-            json_str = os.environ["GSPREAD_KEY"]
-            key_dict = json.loads(json_str)
-        else: return None
-        creds = Credentials.from_service_account_info(key_dict, scopes=SCOPES)
-        return gspread.authorize(creds)
-    except Exception: return None
-
-def get_sheet(sheet_name):
-    client = get_gs_client()
-    if client:
-        try:
-            sh = client.open("tim_team_db")
-            try: return sh.worksheet(sheet_name)
-            except WorksheetNotFound:
-                ws = sh.add_worksheet(title=sheet_name, rows=1000, cols=11) # 增加 cols
-                return ws
-        except Exception: return None
-    return None
-
-# 防斷線緩存機制
-@st.cache_data(ttl=30)
-def read_data(sheet_name):
-    ws = get_sheet(sheet_name)
-    schemas = {
-        "users": ["username", "password", "role", "team", "recruit", "avatar", "last_read"],
-        "monthly_fyc": ["id", "username", "month", "amount"],
-        "activities": ["id", "username", "date", "type", "points", "note", "timestamp"],
-        # 🔥 全新 Schema 結構
-        "story_ammo": ["id", "username", "date", "category", "title", "knowledge", "story_context", "nightmare", "dream", "scenario", "timestamp"]
-    }
-    expected_cols = schemas.get(sheet_name, [])
-    
-    for attempt in range(3): 
-        if ws:
-            try:
-                data = ws.get_all_records()
-                df = pd.DataFrame(data)
-                if df.empty or not set(expected_cols).issubset(df.columns):
-                    for col in expected_cols:
-                        if col not in df.columns: df[col] = "" 
-                    df = df[expected_cols] 
-                
-                if not df.empty:
-                    st.session_state[f'backup_{sheet_name}'] = df 
-                return df
-            except Exception:
-                time.sleep(1) 
-                pass
-                
-    if f'backup_{sheet_name}' in st.session_state:
-        return st.session_state[f'backup_{sheet_name}']
-        
-    return pd.DataFrame(columns=expected_cols)
-
-def clear_cache(): st.cache_data.clear()
-
-def run_query_gs(action, sheet_name, data_dict=None, row_id=None):
-    ws = get_sheet(sheet_name)
-    if not ws: return
-    try:
-        if action == "INSERT":
-            if sheet_name in ["activities", "monthly_fyc", "story_ammo"]:
-                records = ws.get_all_records()
-                new_id = 1
-                if records:
-                    ids = [int(r['id']) for r in records if str(r['id']).isdigit()]
-                    if ids: new_id = max(ids) + 1
-                data_dict['id'] = new_id
-            
-            headers = ws.row_values(1)
-            if not headers: 
-                schemas = {
-                    "monthly_fyc": ["id", "username", "month", "amount"],
-                    "activities": ["id", "username", "date", "type", "points", "note", "timestamp"],
-                    "story_ammo": ["id", "username", "date", "category", "title", "knowledge", "story_context", "nightmare", "dream", "scenario", "timestamp"],
-                    "users": ["username", "password", "role", "team", "recruit", "avatar", "last_read"]
-                }
-                headers = schemas.get(sheet_name, [])
-                if headers: ws.append_row(headers)
-            
-            row_to_add = [str(data_dict.get(h, "")) for h in headers]
-            ws.append_row(row_to_add)
-
-        elif action == "UPDATE":
-            cell = ws.find(str(row_id))
-            if cell:
-                headers = ws.row_values(1)
-                for col, val in data_dict.items():
-                    if col in headers: ws.update_cell(cell.row, headers.index(col) + 1, val)
-        elif action == "DELETE":
-            cell = ws.find(str(row_id))
-            if cell: ws.delete_rows(cell.row)
-        clear_cache()
-    except Exception as e: st.error(f"操作失敗: {e}")
-
-def init_db_gs():
-
-    try:
-
-        ws = get_sheet("users")
-
-        if ws:
-
-            try: existing = ws.col_values(1)
-
-            except Exception: existing = []
-
-            if not existing: 
-
-                ws.append_row(["username", "password", "role", "team", "recruit", "avatar", "last_read"])
-
-                existing = ["username"]
-
-            defaults = [('Admin', 'admin123', 'Leader'), ('Tim', '1234', 'Member'), ('Oscar', '1234', 'Member')]
-
-            for u in defaults:
-
-                if u[0] not in existing:
-
-                    url = f"https://ui-avatars.com/api/?name={u[0]}&background=d4af37&color=fff&size=128"
-
-                    ws.append_row([u[0], u[1], u[2], "Tim Team", 0, url, ""])
-
-                    clear_cache()
-
-        for sn in ["monthly_fyc", "activities", "story_ammo"]:
-
-            ws_tmp = get_sheet(sn)
-
-            if ws_tmp:
-
-                try:
-
-                    if not ws_tmp.row_values(1):
-
-                        if sn == "monthly_fyc": ws_tmp.append_row(["id", "username", "month", "amount"])
-
-                        if sn == "activities": ws_tmp.append_row(["id", "username", "date", "type", "points", "note", "timestamp"])
-
-                        # 🔥 全新 Headers
-
-                        if sn == "story_ammo": ws_tmp.append_row(["id", "username", "date", "category", "title", "knowledge", "story_context", "nightmare", "dream", "scenario", "timestamp"])
-
-                except Exception: pass
-
-    except Exception: pass
-
-
-
-init_db_gs() 
-
-# --- 4. 核心邏輯 ---
-
-def get_clean_users():
-    df = read_data("users")
-    if df.empty: return pd.DataFrame(columns=["username", "password", "role", "team", "recruit", "avatar", "last_read"])
-    df = df.drop_duplicates(subset=['username'], keep='first')
-    return df[~df['username'].isin(INACTIVE_MEMBERS)]
-
-def login(u, p):
-    df = get_clean_users()
-    if df.empty: return []
-    df['password'] = df['password'].astype(str)
-    user = df[(df['username'] == u) & (df['password'] == str(p))]
-    return user.values.tolist() if not user.empty else []
-
-def proc_img(f):
-    try:
-        image = Image.open(f)
-        if image.mode in ("RGBA", "P"): image = image.convert("RGB")
-        image = image.resize((100, 100))
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='JPEG', quality=80)
-        return f"data:image/jpeg;base64,{base64.b64encode(img_byte_arr.getvalue()).decode()}"
-    except Exception: return None
-
-def update_avt(u, i): 
-    ws = get_sheet("users"); cell = ws.find(u)
-    if cell: ws.update_cell(cell.row, ws.row_values(1).index("avatar") + 1, i); clear_cache()
-
-def update_pw(u, p):
-    ws = get_sheet("users"); cell = ws.find(u)
-    if cell: ws.update_cell(cell.row, ws.row_values(1).index("password") + 1, p); clear_cache()
-
-def add_act(u, d, t, n):
-    pts = 8 if "出code" in t else 5 if "簽單" in t else 3 if "報考試" in t else 2 if "傾" in t else 1
-    run_query_gs("INSERT", "activities", {"username": u, "date": str(d), "type": t, "points": pts, "note": n, "timestamp": str(datetime.datetime.now())})
-
-# 🔥 更新傳入參數
-def add_ammo(u, d, cat, title, knowledge, story_context, nightmare, dream, scenario):
-    run_query_gs("INSERT", "story_ammo", {
-        "username": u, "date": str(d), "category": cat, 
-        "title": title, "knowledge": knowledge, "story_context": story_context, 
-        "nightmare": nightmare, "dream": dream, "scenario": scenario, 
-        "timestamp": str(datetime.datetime.now())
-    })
-
-def upd_fyc(u, m, a):
-    df = read_data("monthly_fyc")
-    if not df.empty: df['month'] = df['month'].astype(str).str.strip()
-    exist = df[(df['username'] == u) & (df['month'] == str(m))]
-    if not exist.empty: run_query_gs("UPDATE", "monthly_fyc", {"amount": a}, row_id=exist.iloc[0]['id'])
-    else: run_query_gs("INSERT", "monthly_fyc", {"username": u, "month": str(m), "amount": a})
-
-def upd_rec(u, a):
-    ws = get_sheet("users"); cell = ws.find(u)
-    if cell: ws.update_cell(cell.row, ws.row_values(1).index("recruit") + 1, a); clear_cache()
-
-def del_act(id): run_query_gs("DELETE", "activities", row_id=id)
-
-def get_all_act():
-    df = read_data("activities")
-    if df.empty: return pd.DataFrame(columns=["id", "username", "date", "type", "points", "note", "timestamp"])
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    df = df.drop_duplicates(subset=['username', 'date', 'type', 'note'], keep='first')
-    return df[~df['username'].isin(INACTIVE_MEMBERS)].sort_values(by='date', ascending=False)
-
-def get_data(month=None):
-    base_columns = ['username', 'team', 'recruit', 'avatar', 'fyc', 'Total_Score']
-    users = get_clean_users()
-    users = users[users['role'] == 'Member'][['username', 'team', 'recruit', 'avatar']]
-    if users.empty: return pd.DataFrame(columns=base_columns)
-
-    fyc_df, act_df = read_data("monthly_fyc"), read_data("activities")
-    
-    if not fyc_df.empty and 'amount' in fyc_df.columns:
-        fyc_df['month'] = fyc_df['month'].astype(str).str.strip()
-        fyc_df['amount'] = pd.to_numeric(fyc_df['amount'], errors='coerce').fillna(0)
-        if month == "Yearly": fyc = fyc_df.groupby('username')['amount'].sum().reset_index().rename(columns={'amount': 'fyc'})
-        else: fyc = fyc_df[fyc_df['month'] == str(month)][['username', 'amount']].rename(columns={'amount': 'fyc'})
-    else: fyc = pd.DataFrame(columns=['username', 'fyc'])
-
-    if not act_df.empty and 'points' in act_df.columns:
-        act_df['points'] = pd.to_numeric(act_df['points'], errors='coerce').fillna(0)
-        act = act_df.groupby('username')['points'].sum().reset_index().rename(columns={'points': 'Total_Score'})
-    else: act = pd.DataFrame(columns=['username', 'Total_Score'])
-    
-    df = pd.merge(users, fyc, on='username', how='left').fillna(0)
-    df = pd.merge(df, act, on='username', how='left').fillna(0)
-    
-    df['fyc'] = pd.to_numeric(df['fyc'], errors='coerce').fillna(0).astype(float)
-    df['Total_Score'] = pd.to_numeric(df['Total_Score'], errors='coerce').fillna(0).astype(int)
-    df['recruit'] = pd.to_numeric(df['recruit'], errors='coerce').fillna(0).astype(int)
-    return df
-
-def get_q1_data():
-    users = get_clean_users()
-    users = users[users['role'] == 'Member'][['username', 'avatar']]
-    if users.empty: return pd.DataFrame(columns=['username', 'q1_total'])
-    
-    fyc_df = read_data("monthly_fyc")
-    if not fyc_df.empty:
-        fyc_df['month'] = fyc_df['month'].astype(str).str.strip()
-        fyc_df['amount'] = pd.to_numeric(fyc_df['amount'], errors='coerce').fillna(0)
-        q1 = fyc_df[fyc_df['month'].isin(['2026-01', '2026-02', '2026-03'])]
-        q1_sum = q1.groupby('username')['amount'].sum().reset_index().rename(columns={'amount': 'q1_total'})
-        return pd.merge(users, q1_sum, on='username', how='left').fillna(0)
-    return pd.DataFrame(columns=['username', 'q1_total'])
-
-def get_last_week_data():
-    today = datetime.date.today()
-    current_week_monday = today - datetime.timedelta(days=today.weekday())
-    start = current_week_monday - datetime.timedelta(days=7) 
-    end = start + datetime.timedelta(days=6) 
-    
-    users = get_clean_users()
-    users = users[users['role'] == 'Member'][['username', 'avatar']]
-    if users.empty: return pd.DataFrame(columns=['username', 'wk_score', 'wk_count']), start, end
-    
-    act_df = read_data("activities")
-    stats = pd.DataFrame(columns=['username', 'wk_score', 'wk_count'])
-    
-    if not act_df.empty:
-        act_df['date'] = pd.to_datetime(act_df['date'], errors='coerce').dt.date
-        act_df['points'] = pd.to_numeric(act_df['points'], errors='coerce').fillna(0).astype(int)
-        
-        last_week_acts = act_df[(act_df['date'] >= start) & (act_df['date'] <= end)]
-        if not last_week_acts.empty:
-            stats = last_week_acts.groupby('username').agg(
-                wk_score=('points', 'sum'),
-                wk_count=('points', 'count')
-            ).reset_index()
-            
-    return pd.merge(users, stats, on='username', how='left').fillna(0), start, end
-
-def get_weekly_data():
-    today = datetime.date.today()
-    start = today - datetime.timedelta(days=today.weekday())
-    users = get_clean_users()
-    users = users[users['role'] == 'Member'][['username', 'avatar']]
-    if users.empty: return pd.DataFrame(columns=['username', 'wk_score', 'wk_count']), start, today
-    
-    act_df = read_data("activities")
-    stats = pd.DataFrame(columns=['username', 'wk_score', 'wk_count'])
-    
-    if not act_df.empty:
-        act_df['date'] = pd.to_datetime(act_df['date'], errors='coerce').dt.date
-        act_df['points'] = pd.to_numeric(act_df['points'], errors='coerce').fillna(0).astype(int)
-        this_week = act_df[act_df['date'] >= start]
-        if not this_week.empty:
-            stats = this_week.groupby('username').agg(
-                wk_score=('points', 'sum'),
-                wk_count=('points', 'count')
-            ).reset_index()
-            
-    return pd.merge(users, stats, on='username', how='left').fillna(0), start, today
-
-def update_last_read_time(username):
-    try:
-        ws = get_sheet("users"); cell = ws.find(username)
-        if cell:
-            headers = ws.row_values(1)
-            if "last_read" in headers: ws.update_cell(cell.row, headers.index("last_read") + 1, str(datetime.datetime.now())); clear_cache()
-    except Exception: pass
-
-@st.dialog("🔥 團隊最新戰報 🔥")
-def show_notification_modal(new_activities, current_user):
-    st.markdown(f"**Hi {current_user}，你不在的時候，團隊發生了以下動態：**")
-    for index, row in new_activities.iterrows():
-        act_time = pd.to_datetime(row['timestamp']).strftime('%m/%d %H:%M') if row['timestamp'] else row['date']
-        st.info(f"**👤 {row['username']}** - {row['type']}\n\n📄 {row['note']}\n\n🕒 *{act_time}*")
-    st.markdown("---")
-    if st.button("收到 / OK (我知道了)", type="primary", use_container_width=True):
-        update_last_read_time(current_user); st.rerun()
-
-def check_notifications(current_user):
-    users_df = get_clean_users()
-    act_df = read_data("activities")
-    if users_df.empty or act_df.empty: return
-    user_record = users_df[users_df['username'] == current_user]
-    if user_record.empty: return
-    last_read_str = str(user_record.iloc[0]['last_read'])
-    try: last_read = pd.to_datetime(last_read_str) if last_read_str and last_read_str != "" else pd.to_datetime("2020-01-01")
-    except Exception: last_read = pd.to_datetime("2020-01-01")
-    if 'timestamp' not in act_df.columns: return
-    act_df['timestamp_dt'] = pd.to_datetime(act_df['timestamp'], errors='coerce')
-    new_activities = act_df[(act_df['timestamp_dt'] > last_read) & (act_df['username'] != current_user) & (~act_df['username'].isin(INACTIVE_MEMBERS))]
-    if not new_activities.empty: show_notification_modal(new_activities, current_user)
-
-TEMPLATE_SALES = "【客戶資料】\nName: \n講左3Q? 有咩feedback? \nFact Find 重點: \n\n【面談內容】\nSell左咩Plan? \n客戶反應/抗拒點: \n\n【下一步】\n下次見面日期: \nAction Items: "
-TEMPLATE_RECRUIT = "【準增員資料】\nName: \n背景/現職: \n對現狀不滿 (Pain Points): \n對行業最大顧慮: \n\n【面談內容】\nSell 左咩 Vision?: \n有無邀請去Team Dinner / Recruitment Talk? \n\n【下一步】\n下次跟進日期: \nAction Items: "
-TEMPLATE_NEWBIE = "【新人跟進】\n新人 Name: \n今日進度 (考牌/Training/出Code): \n遇到咩困難?: \nLeader 俾左咩建議?: \n\n【下一步】\nTarget: \n下次 Review 日期: "
-ACTIVITY_TYPES = ["見面 (1分)", "傾保險 (2分)", "傾招募 (2分)", "新人報考試 (3分)", "簽單 (5分)", "新人出code (8分)"]
-
-def get_activity_style(act_type):
-    if "簽單" in act_type: return "card-signed", "badge-signed"
-    if "見面" in act_type or "傾" in act_type: return "card-meeting", "badge-meeting"
-    if "招募" in act_type or "新人" in act_type: return "card-recruit", "badge-recruit"
-    return "card-admin", "badge-default"
-
-# --- 5. UI 渲染 ---
-if 'logged_in' not in st.session_state: st.session_state['logged_in'] = False
-
-if not st.session_state['logged_in']:
-    c1, c2, c3 = st.columns([1,1.5,1])
-    with c2:
-        st.markdown("<br><br>", unsafe_allow_html=True)
-        with st.container():
-            st.markdown("<div style='text-align: center;'><h1>🦁 TIM TEAM 2026</h1></div>", unsafe_allow_html=True)
-            st.markdown("""<div style='background-color: #ffffff; padding: 20px; border-radius: 10px; border: 1px solid #C5A028; text-align: center; margin-bottom: 20px; box-shadow: 0 4px 10px rgba(0,0,0,0.05);'><h2 style='color: #C5A028 !important; margin:0;'>M + 2</h2><h3 style='color: #4A4A4A !important; margin:5px 0 15px 0;'>= 百萬年薪之路 💰</h3><div style='margin-top: 15px; padding-top: 10px; border-top: 1px dashed #ddd;'><span style='color: #666; font-size: 0.9em;'>2027 MDRT Requirement:</span><br><strong style='color: #D4AF37; font-size: 1.3em;'>HK$ 512,800</strong></div></div>""", unsafe_allow_html=True)
-            u = st.text_input("Username", placeholder="e.g., Tim")
-            p = st.text_input("Password", type="password", placeholder="••••••")
-            if st.button("🚀 LOGIN", use_container_width=True):
-                d = login(u, p)
-                if d:
-                    st.session_state.update({'logged_in':True, 'user':d[0][0], 'role':d[0][2], 'avatar':d[0][5]})
-                    st.toast(f"Welcome back, {d[0][0]}!", icon="🦁"); st.rerun()
-                else: st.toast("Login Failed", icon="❌")
-else:
-    check_notifications(st.session_state['user'])
-    with st.sidebar:
-        st.markdown("<br>", unsafe_allow_html=True)
-        c_avt, c_txt = st.columns([1, 2])
-        with c_avt: st.image(st.session_state.get('avatar',''), width=80)
-        with c_txt: 
-            st.markdown(f"<h3 style='margin:0; color:#C5A028 !important;'>{st.session_state['user']}</h3>", unsafe_allow_html=True)
-            st.caption(f"{st.session_state['role']} | TIM TEAM")
-        st.divider()
-        menu = st.radio("MAIN MENU", ["📊 Dashboard 團隊報表", "📝 Check-in 打卡", "📚 Story Depot 彈藥庫", "⚖️ Challenge 獎罰", "🏆 Year Goal 年度挑戰", "🤝 Recruit 招募龍虎榜", "📅 Monthly 業績表", "👤 Profile 設定"], label_visibility="collapsed")
-        st.markdown("<br>"*3, unsafe_allow_html=True)
-        if st.button("🔒 Logout", use_container_width=True, type="secondary"): st.session_state['logged_in'] = False; st.rerun()
-
-    if "Dashboard" in menu:
-        st.markdown(f"## 📊 {st.session_state['user']}, Let's Go MDRT!")
-        if st.session_state['role'] == 'Leader':
-            with st.container(border=True):
-                st.markdown("### 📢 每週戰報生成器 (Admin Only)")
-                if st.button("📝 生成上週結算戰報"):
-                    wk_df, start, end = get_last_week_data()
-                    max_score = wk_df['wk_score'].max() if not wk_df.empty else 0
-                    winners = wk_df[wk_df['wk_score'] == max_score] if not wk_df.empty and max_score > 0 else pd.DataFrame()
-                    losers = wk_df[wk_df['wk_count'] < 3] if not wk_df.empty else pd.DataFrame()
-                    penalty_total = len(losers) * 100
-                    prize_per_winner = penalty_total / len(winners) if penalty_total > 0 and not winners.empty else 100 / len(winners) if not winners.empty else 0
-                    
-                    report = f"📅 *【TIM TEAM 上週戰報 ({start} ~ {end})】* 🦁\n\n"
-                    if max_score > 0 and not winners.empty:
-                        report += f"🏆 *上週 MVP (獨得獎金 ${int(prize_per_winner)}):*\n"
-                        for i, w in winners.iterrows(): report += f"👑 *{w['username']}* ({int(w['wk_score'])}分)\n"
-                        report += f"_多謝 {len(losers)} 位同事贊助獎金池！_\n\n" if penalty_total > 0 else "_全員達標！Tim 自掏 $100 請飲茶！_\n\n"
-                    else: report += "⚠️ *上週全軍覆沒？* 無人開工？\n\n"
-                    
-                    if not losers.empty:
-                        report += f"💸 *【罰款名單 - 每人 $100】*\n_活動量不足 3 次，請自覺 PayMe 俾 Winner！_\n"
-                        for i, l in losers.iterrows(): report += f"❌ {l['username']} (得 {int(l['wk_count'])} 次)\n"
-                    else: report += "✅ *上週無人罰款！Excellent！*\n"
-                    
-                    report += "\n📊 *詳細戰況：*\n"
-                    if not wk_df.empty:
-                        for i, row in wk_df.sort_values(by='wk_score', ascending=False).iterrows():
-                            report += f"{row['username']}: {int(row['wk_score'])}分 ({int(row['wk_count'])}次)\n"
-                    report += "\n🚀 *新一週由零開始，大家加油！*"
-                    st.code(report)
-                    st.link_button("📤 Send to WhatsApp", f"https://wa.me/?text={urllib.parse.quote(report)}")
-
-        df = get_data("Yearly")
-        c1, c2, c3 = st.columns(3)
-        c1.metric("💰 Team FYC", f"${df['fyc'].sum():,.0f}"); c2.metric("👥 Recruits", int(df['recruit'].sum())); c3.metric("🔥 Activities", int(df['Total_Score'].sum()))
-        st.markdown("### 🏆 Leaderboard")
-        mdrt_target = 512800
-        df['mdrt_fraction'] = df['fyc'].apply(lambda x: f"${x:,.0f} / ${mdrt_target:,.0f}")
-        df['mdrt_percent'] = (df['fyc'] / mdrt_target) * 100
-        df_sorted = df.sort_values(by='fyc', ascending=False)
-        st.dataframe(df_sorted[['avatar', 'username', 'mdrt_fraction', 'mdrt_percent', 'recruit', 'Total_Score']],
-            column_config={
-                "avatar": st.column_config.ImageColumn("Avatar", width="small"),
-                "username": st.column_config.TextColumn("Name"),
-                "mdrt_fraction": st.column_config.TextColumn("MDRT 進度 (實數)"),
-                "mdrt_percent": st.column_config.ProgressColumn("MDRT %", format="%.1f%%", min_value=0, max_value=100),
-                "recruit": st.column_config.NumberColumn("Recruit", format="%d"),
-                "Total_Score": st.column_config.NumberColumn("Activity", format="%d")
-            }, use_container_width=True, hide_index=True)
-
-        if st.session_state['role'] == 'Leader':
-            with st.expander("⚙️ 業績/招募管理 (Admin Only)"):
-                c_a, c_b, c_c = st.columns(3)
-                user_list = df['username'].unique().tolist()
-                tgt = c_a.selectbox("User", user_list); mth = c_b.selectbox("Month", [f"2026-{i:02d}" for i in range(1,13)]); amt = c_c.number_input("Amount", step=1000)
-                if st.button("Save FYC"): upd_fyc(tgt, mth, amt); st.toast("Saved!", icon="✅"); st.rerun()
-                st.divider()
-                c_d, c_e = st.columns(2)
-                tgt_r = c_d.selectbox("User", user_list, key="r1"); rec = c_e.number_input("Recruits", step=1)
-                if st.button("Save Recruit"): upd_rec(tgt_r, rec); st.toast("Saved!", icon="✅"); st.rerun()
-
-    elif "Story Depot" in menu:
-        st.markdown("## 📚 逢星期四 Drill Training 素材庫")
-        st.caption("「將客觀數據轉化為真實故事，極端對比出無保障嘅噩夢 vs 有保障嘅美夢」")
-        
-        active_pool_df = get_clean_users()
-        roster_pool = active_pool_df[~active_pool_df['username'].isin(['Admin', 'Tim'])]['username'].dropna().unique().tolist()
-        roster_pool.sort() 
-        
-        if not roster_pool: roster_pool = [u for u in active_pool_df['username'].unique() if u != 'Admin']
-        if not roster_pool: roster_pool = ['本週負責同事']
-        
-        curr_week_num = datetime.date.today().isocalendar()[1]
-        this_week_duty = roster_pool[curr_week_num % len(roster_pool)]
-        
-        st.markdown(f"""
-        <div class="challenge-header-box" style="border-left-color: #9b59b6; background: linear-gradient(to right, #f4ecf7, #ffffff);">
-            <div style="font-size: 1.1em; font-weight: 800; color: #9b59b6; margin-bottom: 5px;">📢 本週 Drill Training (Week {curr_week_num}) 任務分配</div>
-            <div style="font-size: 1.1em; color: #333;">
-                🎯 輪值主講同事： <strong style="color: #9b59b6; font-size:1.25em;">【 {this_week_duty} 】</strong><br>
-                👑 固定主講底子： <strong style="color: #D4AF37; font-size:1.25em;">【 Tim 】</strong>
-            </div>
-            <p style="margin: 8px 0 0 0; font-size: 0.9em; color: #666;">
-                玩法：提交「專業知識點」同「真實故事背景」。Training 時全隊一齊腦力激盪，畫出客戶不作為嘅「噩夢畫面」同擁有方案嘅「美夢畫面」！
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        tab_submit, tab_library = st.tabs(["📥 1. 提交知識素材 (Drill 前)", "📖 2. 團隊武器庫 (天堂與地獄對照)"])
-        
-        with tab_submit:
-            with st.form("ammo_form", clear_on_submit=True):
-                st.markdown("### ✍️ 準備 Heaven & Hell 銷售素材")
-                c_cat, c_date = st.columns(2)
-                with c_cat:
-                    cat = st.selectbox("📌 知識點範疇", [
-                        "行為金融學 (理智漏洞)", 
-                        "醫療理賠 (危機感)", 
-                        "財富傳承 (家族案例)", 
-                        "資產配置 (觀念導正)", 
-                        "市場熱話 / 政策解讀"
-                    ])
-                with c_date:
-                    d = st.date_input("📅 提交日期", value=datetime.date.today())
-                
-                title = st.text_input("🏷️ 知識點主題 (Hook)", placeholder="e.g., 隱形醫療通脹")
-                knowledge = st.text_area("📚 專業知識點 (客觀事實)", height=80, placeholder="e.g., 過去十年香港醫療通脹率平均每年8-10%...")
-                story_context = st.text_area("🗣️ 真實故事背景 (引起共鳴)", height=80, placeholder="e.g., 一位IT中層，突然確診，公司保險3個月就打爆咗...")
-                
-                st.markdown("---")
-                st.markdown("*(以下欄位可於 Training 討論後再完整補上)*")
-                c_night, c_dream = st.columns(2)
-                with c_night:
-                    nightmare = st.text_area("💔 噩夢畫面 (無保障嘅慘況)", height=150, placeholder="e.g., 太太喊到崩潰，要賣樓賣車籌醫藥費...")
-                with c_dream:
-                    dream = st.text_area("✨ 美夢畫面 (擁有保障嘅安心)", height=150, placeholder="e.g., 唯一任務就係專心養病，唔使愁下個月供樓啲錢...")
-                
-                scenario = st.text_input("🎯 實戰場景 (幾時對客講？)", placeholder="e.g., 當客戶嫌醫療保險貴，覺得有公司醫保就夠嗰陣")
-                
-                if st.form_submit_button("🚀 儲存知識素材"):
-                    if title and knowledge and story_context:
-                        add_ammo(st.session_state['user'], d, cat, title, knowledge, story_context, nightmare, dream, scenario)
-                        st.toast("知識點提交成功！", icon="💥")
-                    else:
-                        st.error("「標題」、「知識點」同「真實故事」係必填架！噩夢/美夢可以留空。")
-
-        with tab_library:
-            df_ammo = read_data("story_ammo")
-            if not df_ammo.empty and 'knowledge' in df_ammo.columns:
-                df_ammo = df_ammo.drop_duplicates(subset=['id'], keep='first').sort_values(by='id', ascending=False)
-                
-                col_s, col_f = st.columns([2, 1])
-                with col_s: search_kw = st.text_input("🔍 關鍵字搜尋", placeholder="搜尋標題或故事內容...")
-                with col_f: filter_cat = st.selectbox("📂 分類篩選", ["全部"] + df_ammo['category'].unique().tolist())
-                
-                filtered_df = df_ammo
-                if filter_cat != "全部": filtered_df = filtered_df[filtered_df['category'] == filter_cat]
-                if search_kw:
-                    filtered_df = filtered_df[
-                        filtered_df['title'].str.contains(search_kw, na=False) | 
-                        filtered_df['knowledge'].str.contains(search_kw, na=False) |
-                        filtered_df['story_context'].str.contains(search_kw, na=False)
-                    ]
-                
-                st.markdown(f"**武器庫總存量： {len(filtered_df)} 個 Script**")
-                
-                for idx, row in filtered_df.iterrows():
-                    with st.expander(f"[{row['category']}] {row['title']}  (✍️ 提交人: {row['username']})"):
-                        
-                        st.markdown(f"**📚 專業知識點：**\n{row['knowledge']}")
-                        st.markdown(f"**🗣️ 真實故事背景：**\n{row['story_context']}")
-                        st.markdown("<br>", unsafe_allow_html=True)
-                        
-                        c_night, c_dream = st.columns(2)
-                        with c_night:
-                            if row['nightmare']:
-                                st.markdown(f"<div class='ammo-nightmare'><strong>💔 噩夢畫面 (無買/買錯的代價)：</strong><br><br>{row['nightmare']}</div>", unsafe_allow_html=True)
-                            else:
-                                st.warning("⏳ 噩夢畫面等待 Training 討論...")
-                        with c_dream:
-                            if row['dream']:
-                                st.markdown(f"<div class='ammo-dream'><strong>✨ 美夢畫面 (擁有方案的結果)：</strong><br><br>{row['dream']}</div>", unsafe_allow_html=True)
-                            else:
-                                st.warning("⏳ 美夢畫面等待 Training 討論...")
-                                
-                        st.caption(f"🎯 應用場景：{row['scenario']}  •  📅 記錄日期：{row['date']}")
-            else:
-                st.info("武器庫仲係吉架，快啲提交第一批素材！(請確保已刪除 Google Sheet 舊有嘅 story_ammo)")
-
-    elif "Check-in" in menu:
-        st.markdown("## 📝 Activity Center")
-        tab_new, tab_hist = st.tabs(["✍️ 立即打卡 (Check-in)", "👀 團隊動態 (Team Feed)"])
-        
-        with tab_new:
-            with st.form("checkin_form", clear_on_submit=True):
-                with st.container(border=True):
-                    c_date, c_type = st.columns([1, 1])
-                    with c_date: d = st.date_input("📅 日期", value=datetime.date.today())
-                    with c_type: t = st.selectbox("📌 活動種類", ACTIVITY_TYPES)
-                    note_val = TEMPLATE_RECRUIT if "招募" in t else TEMPLATE_NEWBIE if "新人" in t else TEMPLATE_SALES
-                    n = st.text_area("📝 內容詳情 / 備註", value=note_val, height=180, help="請詳細記錄客戶反應或下一步行動")
-                    st.markdown("<br>", unsafe_allow_html=True)
-                    submitted = st.form_submit_button("🚀 提交打卡 (Submit)", type="primary")
-                    if submitted: 
-                        add_act(st.session_state['user'], d, t, n)
-                        st.toast("提交成功！", icon="✅")
-
-        with tab_hist:
-            st.markdown("### 📜 Timeline")
-            users_df = get_clean_users()
-            user_options = users_df['username'].unique() if not users_df.empty else []
-            filter_user = st.multiselect("🔍 篩選同事 (Filter)", options=user_options)
-            
-            all_acts = get_all_act()
-            if not all_acts.empty:
-                users_mini = users_df[['username', 'avatar']]
-                all_acts = pd.merge(all_acts, users_mini, on='username', how='left')
-                display_df = all_acts[all_acts['username'].isin(filter_user)] if filter_user else all_acts
-                
-                for idx, row in display_df.iterrows():
-                    act_date = pd.to_datetime(row['date']).strftime('%Y-%m-%d')
-                    act_time = pd.to_datetime(row['timestamp']).strftime('%H:%M') if row['timestamp'] else ""
-                    avatar_url = row['avatar'] if isinstance(row['avatar'], str) and row['avatar'].startswith('http') else "https://ui-avatars.com/api/?background=random&color=fff&name=" + row['username']
-                    card_class, badge_class = get_activity_style(row['type'])
-                    
-                    st.markdown(f"""
-                    <div class="activity-card {card_class}">
-                        <div class="act-header">
-                            <div class="act-user-info">
-                                <img src="{avatar_url}" class="act-avatar">
-                                <div><div class="act-name">{row['username']}</div><div class="act-time">{act_date} {act_time}</div></div>
-                            </div>
-                            <div class="act-badge {badge_class}">{row['type']}</div>
-                        </div>
-                        <div class="act-content">{row['note'].replace(chr(10), '<br>')}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-            else:
-                st.info("暫無動態，快啲去 Check-in！")
-
-    elif "Challenge" in menu:
-        df, start, end = get_weekly_data()
-        st.markdown(f"## ⚖️ Winner Takes All ({start} ~ {end})")
-        st.markdown("""<div class="challenge-header-box"><div class="challenge-title">📜 詳細遊戲規則 (Game Rules)：</div><ul class="challenge-rules"><li><strong>結算時間：</strong> 逢星期日晚 23:59 系統自動結算。</li><li><strong>罰款準則：</strong> 每週活動量 (Count) <strong>少於 3 次</strong> 者，需罰款 <strong>$100</strong>。</li><li><strong>獎金歸屬：</strong> 所有罰款注入獎金池，由 <strong>最高分 (Score)</strong> 者獨得。</li></ul></div>""", unsafe_allow_html=True)
-        if not df.empty:
-            max_score = df['wk_score'].max(); winners = df[df['wk_score'] == max_score] if max_score > 0 else pd.DataFrame()
-            pool = len(df[df['wk_count'] < 3]) * 100
-            st.markdown(f"### 🏆 Prize Pool: <span style='color:#C5A028'>${pool if pool > 0 else 100}</span>", unsafe_allow_html=True)
-            if not winners.empty:
-                cols = st.columns(len(winners)); 
-                for idx, row in winners.reset_index().iterrows(): cols[idx].image(row['avatar'], width=60); cols[idx].caption(f"👑 {row['username']}")
-            st.dataframe(df[['avatar', 'username', 'wk_score', 'wk_count']].sort_values(by='wk_score', ascending=False),
-                         column_config={"avatar": st.column_config.ImageColumn("", width="small"), "wk_score": st.column_config.ProgressColumn("Score", format="%d", max_value=max(10, max_score))}, use_container_width=True, hide_index=True)
-
-    elif "Year Goal" in menu:
-        st.markdown("## 🏆 2026 年度挑戰")
-        q1_df = get_q1_data(); q1_target = 88000
-        st.markdown("""<div class="challenge-header-box"><div class="challenge-title">🔥 Q1 88000 Challenge (1/1 - 31/3)</div><p class="challenge-rules"><strong>目標：</strong> 第一季 (Q1) 累積 FYC 達 <strong>HK$ 88,000</strong>。<br>這是通往 MDRT 的第一張入場券，必須拿下！</p></div>""", unsafe_allow_html=True)
-        if not q1_df.empty:
-            for i, r in q1_df.sort_values(by='q1_total', ascending=False).iterrows():
-                progress = min(r['q1_total'] / q1_target, 1.0)
-                st.markdown(f"""<div class="q1-player-card"><div class="q1-avatar-box"><img src="{r['avatar']}"></div><div class="q1-info-box"><div class="q1-name">{r['username']}</div><div class="q1-amount">${r['q1_total']:,.0f}</div><div class="q1-progress-container"><div class="q1-progress-bar" style="width: {progress*100}%;"></div></div><div class="q1-target-label">Target: $88,000 ({progress*100:.1f}%)</div></div></div>""", unsafe_allow_html=True)
-        else: st.info("暫無 Q1 業績數據，加油！")
-        st.divider(); st.markdown("### 🎁 年度獎賞計劃")
-        c1, c2 = st.columns(2)
-        with c1: st.markdown('<div class="reward-card-premium"><span class="reward-icon">🚀</span><p class="reward-title-p">1st MDRT</p><p class="reward-prize-p">$20,000 Cash</p><p class="reward-desc-p">首位完成 $512,800 FYC 者獨得</p></div>', unsafe_allow_html=True)
-        with c2: st.markdown('<div class="reward-card-premium"><span class="reward-icon">👑</span><p class="reward-title-p">Top FYC 冠軍</p><p class="reward-prize-p">$10,000 Cash</p><p class="reward-desc-p">全年業績最高者 (需 Min. 180,000 FYC)</p></div>', unsafe_allow_html=True)
-        st.write(""); c3, c4 = st.columns(2)
-        with c3: st.markdown('<div class="reward-card-premium"><span class="reward-icon">✈️</span><p class="reward-title-p">招募冠軍</p><p class="reward-prize-p">雙人來回機票</p><p class="reward-desc-p">全年招募人數最多者 (需 Min. 2人)</p></div>', unsafe_allow_html=True)
-        with c4: st.markdown('<div class="reward-card-premium"><span class="reward-icon">🍽️</span><p class="reward-title-p">Monthly Star</p><p class="reward-prize-p">Tim 請食飯</p><p class="reward-desc-p">單月 FYC 最高者 (需 Min. $20k)</p></div>', unsafe_allow_html=True)
-
-    elif "Recruit" in menu:
-        st.markdown("## 🤝 Recruit 龍虎榜")
-        df = get_data("Yearly")
-        if not df.empty:
-            st.dataframe(
-                df[['avatar', 'username', 'recruit']].sort_values(by='recruit', ascending=False),
-                column_config={
-                    "avatar": st.column_config.ImageColumn("Avatar", width="small"),
-                    "username": st.column_config.TextColumn("Agent"),
-                    "recruit": st.column_config.ProgressColumn("Recruits (Headcount)", format="%d", min_value=0, max_value=10)
-                }, use_container_width=True, hide_index=True
-            )
-        else: st.info("暫無招募數據，大家加油！")
-
-    elif "Monthly" in menu:
-        st.markdown("## 📅 Monthly FYC 龍虎榜")
-        m = st.selectbox("Month", [f"2026-{i:02d}" for i in range(1,13)])
-        df = get_data(month=m)
-        if not df.empty:
-            max_fyc = df['fyc'].max() if df['fyc'].max() > 0 else 50000
-            st.dataframe(
-                df[['avatar', 'username', 'fyc']].sort_values(by='fyc', ascending=False),
-                column_config={
-                    "avatar": st.column_config.ImageColumn("Avatar", width="small"),
-                    "username": st.column_config.TextColumn("Agent"),
-                    "fyc": st.column_config.ProgressColumn("FYC Achievement", format="$%d", min_value=0, max_value=max_fyc)
-                }, use_container_width=True, hide_index=True
-            )
-        else: st.info("本月暫無數據")
-
-    elif "Profile" in menu:
-        st.markdown("## 👤 User Profile")
-        col1, col2 = st.columns([1, 2])
-        with col1: st.image(st.session_state.get('avatar'), width=150)
-        with col2:
-            st.markdown(f"### {st.session_state['user']}"); st.markdown(f"**Role:** {st.session_state['role']}")
-            with st.expander("🔐 Change Password"):
-                new_pw = st.text_input("New Password", type="password")
-                if st.button("Update Password"): update_pw(st.session_state['user'], new_pw); st.toast("Password Updated!", icon="✅")
-            with st.expander("🖼️ Change Avatar"):
-                uploaded_file = st.file_uploader("Upload Image", type=['jpg', 'png', 'jpeg'])
-                if uploaded_file is not None:
-                    if st.button("Upload"):
-                        img_str = proc_img(uploaded_file)
-                        if img_str: update_avt(st.session_state['user'], img_str); st.session_state['avatar'] = img_str; st.toast("Avatar Updated!", icon="✅"); st.rerun()
+import streamlit as st
+import pandas as pd
+import datetime
+import base64
+import json
+import gspread
+import os
+import io
+import hashlib
+import hmac
+import time
+import atexit
+import random
+import sqlite3
+import threading
+import urllib.parse
+import re
+import math
+import bisect
+import collections
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.oauth2.service_account import Credentials
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+from gspread.exceptions import WorksheetNotFound, APIError
+from gspread.utils import numericise, a1_to_rowcol, rowcol_to_a1
+from gspread.http_client import HTTPClient
+
+# --- 1. 系統設定 ---
+st.set_page_config(page_title="TIM TEAM 2026", page_icon="🦁", layout="wide", initial_sidebar_state="expanded")
+
+# --- Custom CSS ---
+st.markdown("""
+<style>
+    [data-testid="stAppViewContainer"] { background-color: #f8f9fa !important; } 
+    [data-testid="stSidebar"] { background-color: #ffffff !important; border-right: 1px solid #e9ecef; }
+    [data-testid="stHeader"] { background-color: rgba(0,0,0,0) !important; }
+    h1, h2, h3, h4, h5, h6, p, div, span, label, li, .stMarkdown, .stText { color: #2c3e50 !important; font-family: 'Helvetica Neue', sans-serif; }
+    h1, h2, h3 { color: #C5A028 !important; font-weight: 800 !important; letter-spacing: 0.5px; }
+
+    div[role="radiogroup"] > label > div:first-child { display: none !important; }
+    div[role="radiogroup"] label {
+        background-color: #ffffff !important; padding: 12px 15px !important; margin-bottom: 8px !important;
+        border-radius: 10px !important; border: 1px solid #e9ecef !important;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.03) !important; transition: all 0.3s ease !important; width: 100% !important;
+    }
+    div[role="radiogroup"] label:hover {
+        border-color: #D4AF37 !important; background-color: #FFF8E1 !important;
+        transform: translateX(5px); box-shadow: 0 4px 8px rgba(212, 175, 55, 0.2) !important;
+    }
+
+    div[data-testid="stMetric"], div.css-1r6slb0, .stContainer, div[data-testid="stExpander"] { background-color: #ffffff !important; border: 1px solid #e0e0e0 !important; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.05); transition: all 0.3s ease; }
+    .stTextInput > div > div > input, .stTextArea > div > div > textarea, .stDateInput > div > div > input, .stSelectbox > div > div { background-color: #fdfdfd !important; border: 1px solid #dce4ec !important; border-radius: 8px; }
+    div.stButton > button { background: linear-gradient(135deg, #D4AF37 0%, #B38F21 100%) !important; color: #FFFFFF !important; border: none; border-radius: 8px; font-weight: 600; letter-spacing: 1px; box-shadow: 0 4px 10px rgba(212, 175, 55, 0.3); width: 100%;}
+    img { border-radius: 50%; }
+
+    .admin-edit-box { border: 2px dashed #C5A028; padding: 15px; border-radius: 10px; background-color: #fffdf0; margin-top: 15px; }
+
+    .activity-card { background-color: #ffffff; border-radius: 12px; padding: 16px; margin-bottom: 12px; border-left: 5px solid #e9ecef; box-shadow: 0 2px 8px rgba(0,0,0,0.05); transition: transform 0.2s;}
+    .activity-card:hover { transform: translateY(-2px); box-shadow: 0 5px 15px rgba(0,0,0,0.1); }
+    .card-signed { border-left-color: #D4AF37 !important; } 
+    .card-meeting { border-left-color: #3498db !important; }
+    .card-recruit { border-left-color: #9b59b6 !important; } 
+    .card-admin { border-left-color: #95a5a6 !important; }
+    .act-header { display: flex; justify-content: space-between; align-items: center; margin-bottom: 8px; }
+    .act-avatar { width: 40px; height: 40px; border-radius: 50%; object-fit: cover; margin-right: 10px; border: 2px solid #f0f0f0;}
+    .act-name { font-weight: bold; color: #2c3e50; }
+    .act-time { font-size: 0.85em; color: #95a5a6; }
+    .act-badge { padding: 4px 10px; border-radius: 12px; font-size: 0.8em; font-weight: 600; letter-spacing: 0.5px; }
+    .badge-signed { background-color: #FFF8E1; color: #D4AF37; border: 1px solid #D4AF37; }
+    .badge-meeting { background-color: #ebf5fb; color: #3498db; border: 1px solid #3498db; }
+    .badge-recruit { background-color: #f4ecf7; color: #9b59b6; border: 1px solid #9b59b6; }
+    .badge-default { background-color: #f8f9fa; color: #7f8c8d; border: 1px solid #bdc3c7; }
+    .act-content { background-color: #f8f9fa; padding: 10px; border-radius: 8px; color: #555; font-size: 0.95em; line-height: 1.5; margin-top: 5px;}
+
+    .reward-card-premium { 
+        background: linear-gradient(145deg, #ffffff, #fffdf5); 
+        border: 2px solid #D4AF37; 
+        border-radius: 16px; padding: 25px 20px; text-align: center; 
+        box-shadow: 0 10px 25px rgba(212, 175, 55, 0.15); 
+        transition: all 0.3s ease; height: 100%; position: relative; overflow: hidden; 
+    }
+    .reward-card-premium::before { content: ""; position: absolute; top: 0; left: 0; width: 100%; height: 8px; background: linear-gradient(90deg, #D4AF37, #FDC830, #D4AF37); }
+    .reward-card-premium:hover { transform: translateY(-5px); box-shadow: 0 15px 35px rgba(212, 175, 55, 0.3); }
+    .reward-icon { font-size: 3em; margin-bottom: 15px; display: block; filter: drop-shadow(0 2px 2px rgba(0,0,0,0.1)); }
+    .reward-title-p { color: #D4AF37; font-size: 1.3em; font-weight: 800; margin-bottom: 10px; text-transform: uppercase; letter-spacing: 1.5px; }
+    .reward-prize-p { color: #c0392b; font-size: 1.6em; font-weight: 900; margin-bottom: 10px; text-shadow: 1px 1px 0px rgba(0,0,0,0.05); }
+    .reward-desc-p { color: #7f8c8d; font-size: 0.9em; line-height: 1.4; font-weight: 500; }
+    .challenge-header-box { background: linear-gradient(to right, #FFF8E1, #FFFFFF); border-left: 6px solid #D4AF37; padding: 25px; border-radius: 12px; box-shadow: 0 4px 15px rgba(0,0,0,0.05); margin-bottom: 25px; }
+    
+    /* 彈藥庫專用標籤 */
+    .ammo-nightmare { background-color: #fdedec; border-left: 4px solid #e74c3c; padding: 15px; border-radius: 5px; margin-bottom: 10px; }
+    .ammo-dream { background-color: #eafaf1; border-left: 4px solid #2ecc71; padding: 15px; border-radius: 5px; margin-bottom: 10px; }
+</style>
+""", unsafe_allow_html=True)
+
+# 離職成員黑名單
+INACTIVE_MEMBERS = ['Wilson', 'Catherine', 'Maggie']
+
+# 效能監察：每個 Sheets API call (按 sheet / verb)、主要函數耗時、每次 rerun 耗時、read_data cache 命中率
+RUN_STARTED = time.perf_counter()
+RERUN_HISTORY = 500
+SLOW_CALL_MS = 2000  # 超過就寫 warning log
+metrics_log = logging.getLogger("tim_team.metrics")
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = str(datetime.datetime.now())
+        self.api, self.funcs, self.cache = {}, {}, {}  # api: (sheet, verb) -> [calls, errors, total_ms, max_ms]
+        self.reruns = collections.deque(maxlen=RERUN_HISTORY)
+
+    def api_call(self, sheet_name, verb, ms, ok):
+        with self.lock:
+            c = self.api.setdefault((sheet_name, verb), [0, 0, 0.0, 0.0])
+            c[0] += 1; c[1] += not ok; c[2] += ms; c[3] = max(c[3], ms)
+        if ms > SLOW_CALL_MS or not ok: metrics_log.warning(json.dumps({"event": "sheets_api", "sheet": sheet_name, "verb": verb, "ms": round(ms, 1), "ok": ok}))
+
+    def timing(self, name, ms):
+        with self.lock:
+            c = self.funcs.setdefault(name, [0, 0.0, 0.0])
+            c[0] += 1; c[1] += ms; c[2] = max(c[2], ms)
+
+    # cache: name -> [calls, misses]；miss 喺 cache 函數入面記，hits = calls - misses
+    def cache_lookup(self, name, miss=False):
+        with self.lock: self.cache.setdefault(name, [0, 0])[1 if miss else 0] += 1
+
+    def rerun(self, page, ms):
+        with self.lock: self.reruns.append((str(datetime.datetime.now()), page, round(ms, 1)))
+        metrics_log.info(json.dumps({"event": "rerun", "page": page, "ms": round(ms, 1)}, ensure_ascii=False))
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "started": self.started,
+                "api": [{"sheet": s, "verb": v, "calls": c[0], "errors": c[1], "total_ms": round(c[2], 1), "max_ms": round(c[3], 1)} for (s, v), c in self.api.items()],
+                "functions": [{"name": n, "calls": c[0], "total_ms": round(c[1], 1), "avg_ms": round(c[1] / c[0], 2), "max_ms": round(c[2], 1)} for n, c in self.funcs.items()],
+                "cache": [{"name": n, "calls": c[0], "misses": c[1], "hit_ratio": round(1 - c[1] / max(1, c[0]), 3)} for n, c in self.cache.items()],
+                "reruns": [{"at": a, "page": p, "ms": ms} for a, p, ms in self.reruns],
+            }
+
+@st.cache_resource
+def get_metrics(): return Metrics()
+
+def timed(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        t = time.perf_counter()
+        try: return fn(*args, **kwargs)
+        finally: get_metrics().timing(fn.__qualname__, (time.perf_counter() - t) * 1000)
+    return wrapper
+
+# 由 API URL 認返係邊張 sheet、咩動作；batch call 涉及多張 sheet 就記做 "*"
+def api_call_key(method, endpoint, params=None, body=None):
+    path = urllib.parse.unquote(urllib.parse.urlparse(endpoint).path)
+    if "/spreadsheets/" not in path: return "*", f"{method.upper()} drive"
+    rest = path.split("/spreadsheets/", 1)[1]
+    _, values, tail = rest.partition("/values")
+    if not values: return "*", f"{method.upper()} spreadsheet" + (":" + rest.rsplit(":", 1)[1] if ":" in rest else "")
+    if tail.startswith(":"):
+        ranges = (params or {}).get("ranges") or [d.get("range", "") for d in (body or {}).get("data", [])]
+        sheets = {str(r).split("!")[0].strip("'") for r in ([ranges] if isinstance(ranges, str) else ranges)}
+        return (sheets.pop() if len(sheets) == 1 else "*"), f"{method.upper()} values{tail}"
+    rng = tail[1:]; op = rng.rsplit(":", 1)[-1]
+    return rng.split("!")[0].strip("'"), f"{method.upper()} values" + (f":{op}" if op in ("append", "clear") else "")
+
+class MeteredHTTPClient(HTTPClient):
+    def request(self, method, endpoint, params=None, **kwargs):
+        sheet_name, verb = api_call_key(method, endpoint, params, kwargs.get("json"))
+        t, ok = time.perf_counter(), False
+        try:
+            res = super().request(method, endpoint, params=params, **kwargs); ok = True
+            return res
+        finally: get_metrics().api_call(sheet_name, verb, (time.perf_counter() - t) * 1000, ok)
+
+# Google Sheets 設定
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+
+@st.cache_resource
+def get_gs_client():
+    try:
+        if "service_account" in st.secrets:
+            json_str = st.secrets["service_account"]["key_content"]
+            key_dict = json.loads(json_str)
+        elif "GSPREAD_KEY" in os.environ:
+            json_str = os.environ["GSPREAD_KEY"]
+            key_dict = json.loads(json_str)
+        else: return None
+        creds = Credentials.from_service_account_info(key_dict, scopes=SCOPES)
+        # 共用一個 HTTP session，keep-alive 連線俾 UI / 同步 / 寫入 thread 重用
+        session = AuthorizedSession(creds)
+        session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        return gspread.authorize(creds, http_client=MeteredHTTPClient, session=session)
+    except Exception: return None
+
+# Worksheet handle pool：spreadsheet / worksheet / header 開一次就 cache 住，WorksheetNotFound 或者 auth 過期先重新開
+class SheetPool:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.sh, self.worksheets, self.headers = None, {}, {}
+        self.hits, self.misses, self.refreshes = 0, 0, 0
+
+    def spreadsheet(self):
+        with self.lock:
+            if self.sh is not None: self.hits += 1; return self.sh
+            client = get_gs_client()
+            if not client: return None
+            self.misses += 1
+            self.sh = client.open("tim_team_db")
+            return self.sh
+
+    def worksheet(self, sheet_name):
+        with self.lock:
+            if sheet_name in self.worksheets: self.hits += 1; return self.worksheets[sheet_name]
+            sh = self.spreadsheet()
+            if sh is None: return None
+            self.misses += 1
+            try: ws = sh.worksheet(sheet_name)
+            except WorksheetNotFound: ws = sh.add_worksheet(title=sheet_name, rows=1000, cols=11) # 增加 cols
+            self.worksheets[sheet_name] = ws
+            return ws
+
+    # auth 過期連 client 都重新建立；其他情況只丟走嗰張 sheet 嘅 handle
+    def refresh(self, sheet_name=None, reauth=False):
+        with self.lock:
+            self.refreshes += 1
+            if reauth or sheet_name is None:
+                self.sh, self.worksheets, self.headers = None, {}, {}
+                if reauth: get_gs_client.clear()
+            else:
+                self.worksheets.pop(sheet_name, None); self.headers.pop(sheet_name, None)
+
+    def stats(self):
+        with self.lock: return {"hits": self.hits, "misses": self.misses, "refreshes": self.refreshes, "hit_ratio": self.hits / max(1, self.hits + self.misses)}
+
+@st.cache_resource
+def get_sheet_pool(): return SheetPool()
+
+def is_stale_handle(e):
+    return isinstance(e, WorksheetNotFound) or (isinstance(e, APIError) and getattr(e, "code", None) in (401, 404))
+
+# 用 pool 入面嘅 handle 做一次 call，handle 失效就 refresh 再試一次
+def with_sheet(sheet_name, call):
+    ws = get_sheet(sheet_name)
+    if not ws: return None
+    try: return call(ws)
+    except Exception as e:
+        if not is_stale_handle(e): raise
+        get_sheet_pool().refresh(sheet_name, reauth=getattr(e, "code", None) == 401)
+        ws = get_sheet(sheet_name)
+        return call(ws) if ws else None
+
+def get_spreadsheet():
+    try: return get_sheet_pool().spreadsheet()
+    except Exception: return None
+
+def get_sheet(sheet_name):
+    try: return get_sheet_pool().worksheet(sheet_name)
+    except Exception: return None
+
+# 本地副本 (SQLite)：read_data 只讀本地，背景 thread 負責同 Google Sheet 同步
+SCHEMAS = {
+    "users": ["username", "password", "role", "team", "recruit", "avatar", "last_read"],
+    "monthly_fyc": ["id", "username", "month", "amount"],
+    "activities": ["id", "username", "date", "type", "points", "note", "timestamp"],
+    # 🔥 全新 Schema 結構
+    "story_ammo": ["id", "username", "date", "category", "title", "knowledge", "story_context", "nightmare", "dream", "scenario", "timestamp"],
+    "weekly_ledger": ["id", "week", "username", "score", "count", "penalty", "prize", "settled_at"]
+}
+ID_SHEETS = ["activities", "monthly_fyc", "story_ammo", "weekly_ledger"]
+REPLICA_PATH = os.environ.get("TIM_REPLICA_PATH", "tim_team_replica.db")
+SYNC_INTERVAL = 30
+DELTA_SHEETS = ["activities"]  # 只會 append (刪除由水位檢查發現)
+FULL_SYNC_EVERY = 20  # 每 20 輪做一次全表同步，執返喺 Google Sheet 直接改嘅舊行
+ID_CHECK_ROWS = 50
+
+def sheet_key(sheet_name): return "username" if sheet_name == "users" else "id"
+
+class Replica:
+    def __init__(self, path):
+        self.lock = threading.RLock()
+        self.versions = {}  # 每張 sheet 嘅資料版本，有改動先 +1；read_data 嘅 cache 跟版本走
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS rows (sheet TEXT, pos INTEGER, key TEXT, data TEXT, PRIMARY KEY (sheet, pos))")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS rows_key ON rows (sheet, key)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS synced (sheet TEXT PRIMARY KEY, at TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS max_ids (sheet TEXT PRIMARY KEY, max_id INTEGER)")
+        self.conn.commit()
+        self.synced = {r[0] for r in self.conn.execute("SELECT sheet FROM synced")}
+        # 每張 sheet 用過嘅最大 id (high-water mark)，只會向上升；存埋落 max_ids，行刪咗 (例如封存) 重開都唔會再用返舊 id
+        self.max_ids = dict(self.conn.execute("SELECT sheet, MAX(CAST(key AS INTEGER)) FROM rows WHERE key GLOB '[0-9]*' GROUP BY sheet").fetchall())
+        for sn, mx in self.conn.execute("SELECT sheet, max_id FROM max_ids"): self.max_ids[sn] = max(self.max_ids.get(sn) or 0, mx)
+
+    def is_synced(self, sheet_name): return sheet_name in self.synced
+
+    def version(self, sheet_name): return self.versions.get(sheet_name, 0)
+
+    def bump(self, sheet_name):
+        with self.lock: self.versions[sheet_name] = self.versions.get(sheet_name, 0) + 1
+
+    def see_id(self, sheet_name, value):
+        if str(value).isdigit(): self.max_ids[sheet_name] = max(self.max_ids.get(sheet_name, 0), int(value))
+
+    # 喺 lock 入面預留新 id，同一 process 兩個人同時提交都唔會撞號
+    def next_id(self, sheet_name, at_least=1):
+        with self.lock:
+            new_id = max(self.max_ids.get(sheet_name, 0) + 1, at_least)
+            self.max_ids[sheet_name] = new_id
+            with self.conn: self.conn.execute("INSERT INTO max_ids VALUES (?, ?) ON CONFLICT(sheet) DO UPDATE SET max_id = MAX(max_id, excluded.max_id)", (sheet_name, new_id))
+            return new_id
+
+    def load(self, sheet_name):
+        with self.lock: rows = self.conn.execute("SELECT data FROM rows WHERE sheet = ? ORDER BY pos", (sheet_name,)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    # 全表同步：只改寫內容有變嘅 row
+    # 同步期間本地有寫入 (version 變咗) 就放棄今次結果，等下一輪
+    def replace(self, sheet_name, records, version=None):
+        key = sheet_key(sheet_name); changed = 0
+        with self.lock:
+            if version is not None and self.version(sheet_name) != version: return None
+            old = dict(self.conn.execute("SELECT pos, data FROM rows WHERE sheet = ?", (sheet_name,)).fetchall())
+            with self.conn:
+                for pos, r in enumerate(records, start=2):
+                    data = json.dumps(r, ensure_ascii=False)
+                    if sheet_name in ID_SHEETS: self.see_id(sheet_name, r.get(key, ""))
+                    if old.get(pos) != data:
+                        self.conn.execute("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?)", (sheet_name, pos, str(r.get(key, "")), data)); changed += 1
+                stale = [(sheet_name, p) for p in old if p >= len(records) + 2]
+                if stale: self.conn.executemany("DELETE FROM rows WHERE sheet = ? AND pos = ?", stale); changed += len(stale)
+                self.conn.execute("INSERT OR REPLACE INTO synced VALUES (?, ?)", (sheet_name, str(datetime.datetime.now())))
+            self.synced.add(sheet_name)
+            if changed: self.bump(sheet_name)
+        return changed
+
+    # Delta sync 水位：最尾一行嘅行號同內容；中間有窿 (本地刪過嘢) 就冇水位，要全表同步
+    def watermark(self, sheet_name):
+        with self.lock:
+            n, last = self.conn.execute("SELECT COUNT(*), MAX(pos) FROM rows WHERE sheet = ?", (sheet_name,)).fetchone()
+            if not n or last != n + 1: return None
+            return last, json.loads(self.conn.execute("SELECT data FROM rows WHERE sheet = ? AND pos = ?", (sheet_name, last)).fetchone()[0])
+
+    # 將 Sheet 水位之後新增嘅行接落本地 (start 係第一行新資料嘅行號)
+    def extend(self, sheet_name, records, start, version=None):
+        key = sheet_key(sheet_name)
+        with self.lock:
+            if version is not None and self.version(sheet_name) != version: return None
+            with self.conn:
+                for pos, r in enumerate(records, start=start):
+                    if sheet_name in ID_SHEETS: self.see_id(sheet_name, r.get(key, ""))
+                    self.conn.execute("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?)", (sheet_name, pos, str(r.get(key, "")), json.dumps(r, ensure_ascii=False)))
+                self.conn.execute("INSERT OR REPLACE INTO synced VALUES (?, ?)", (sheet_name, str(datetime.datetime.now())))
+            if records: self.bump(sheet_name)
+        return len(records)
+
+    # Write-through：run_query_gs 寫完 Sheet 之後即刻同步落本地
+    def insert(self, sheet_name, record):
+        record = {k: numericise(str(v)) for k, v in record.items()}
+        with self.lock, self.conn:
+            if sheet_name in ID_SHEETS: self.see_id(sheet_name, record.get("id", ""))
+            pos = self.conn.execute("SELECT COALESCE(MAX(pos), 1) + 1 FROM rows WHERE sheet = ?", (sheet_name,)).fetchone()[0]
+            self.conn.execute("INSERT INTO rows VALUES (?, ?, ?, ?)", (sheet_name, pos, str(record.get(sheet_key(sheet_name), "")), json.dumps(record, ensure_ascii=False)))
+            self.bump(sheet_name)
+
+    def update(self, sheet_name, key, changes):
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT pos, data FROM rows WHERE sheet = ? AND key = ? ORDER BY pos LIMIT 1", (sheet_name, str(key))).fetchone()
+            if row:
+                data = json.loads(row[1]); data.update({k: numericise(str(v)) for k, v in changes.items() if k in data})
+                self.conn.execute("UPDATE rows SET key = ?, data = ? WHERE sheet = ? AND pos = ?", (str(data.get(sheet_key(sheet_name), key)), json.dumps(data, ensure_ascii=False), sheet_name, row[0]))
+            self.bump(sheet_name)
+
+    def delete(self, sheet_name, key):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM rows WHERE sheet = ? AND pos = (SELECT MIN(pos) FROM rows WHERE sheet = ? AND key = ?)", (sheet_name, sheet_name, str(key)))
+            self.bump(sheet_name)
+
+    def delete_many(self, sheet_name, keys):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM rows WHERE sheet = ? AND pos = (SELECT MIN(pos) FROM rows WHERE sheet = ? AND key = ?)", [(sheet_name, sheet_name, str(k)) for k in keys])
+            self.bump(sheet_name)
+
+@st.cache_resource
+def get_replica(): return Replica(REPLICA_PATH)
+
+def sheet_record(headers, values):
+    return dict(zip(headers, [numericise(str(v)) for v in (list(values) + [""] * len(headers))[:len(headers)]]))
+
+# 只攞水位嗰行之後嘅 A1 range；水位嗰行對唔上 (有人刪過 / 改過) 就回 None，交返全表同步
+def sync_tail(sheet_name, version, gen):
+    rep, index = get_replica(), get_row_index()
+    mark = rep.watermark(sheet_name)
+    if not mark: return None
+    pos, last = mark
+    def fetch(ws):
+        headers = get_headers(ws, sheet_name)
+        last_col = rowcol_to_a1(1, max(1, len(headers)))[:-1]
+        return headers, with_backoff(ws.get_values, f"A{pos}:{last_col}")
+    res = with_sheet(sheet_name, fetch)
+    if res is None: return None
+    headers, rows = res
+    if not rows: return None
+    anchor = sheet_record(headers, rows[0])
+    if any(str(anchor.get(c, "")) != str(last.get(c, "")) for c in (sheet_key(sheet_name), "timestamp")): return None
+    records = [sheet_record(headers, r) for r in rows[1:]]  # 空行都要留住佔位，同全表同步一樣，行號先對得上
+    added = rep.extend(sheet_name, records, pos + 1, version=version)
+    if added: index.appended(sheet_name, [r.get(sheet_key(sheet_name), "") for r in records], pos + 1, gen=gen)
+    return added
+
+# 多張 sheet 一個 values_batch_get 攞晒：冷開機 / 全表同步只係一個 round trip，唔係每張 sheet 一個
+def batch_get_sheets(sheet_names):
+    def call():
+        sh = get_spreadsheet()
+        return sh.values_batch_get([f"'{sn}'" for sn in sheet_names]).get("valueRanges", []) if sh else None
+    try: res = call()
+    except Exception as e:
+        # 一張 sheet 唔存在 (例如 bootstrap 前嘅 weekly_ledger) 成個 batch 都會 400：逐張攞，get_sheet 會開返缺咗嗰張
+        if isinstance(e, APIError) and getattr(e, "code", None) == 400: res = [{"values": with_sheet(sn, lambda ws: ws.get_values()) or []} for sn in sheet_names]
+        elif not is_stale_handle(e): raise
+        else:
+            get_sheet_pool().refresh(reauth=getattr(e, "code", None) == 401)
+            res = call()
+    if res is None: return None
+    out = {}
+    for sn, vr in zip(sheet_names, res):
+        rows = vr.get("values", [])
+        headers = rows[0] if rows else []
+        out[sn] = [sheet_record(headers, r) for r in rows[1:]]
+    return out
+
+@timed
+def sync_sheets(sheet_names, full=False):
+    rep, index, wq = get_replica(), get_row_index(), get_write_queue()
+    out, fetch = {}, {}
+    for sn in sheet_names:
+        if wq.pending(sn): continue  # 未寫完出去嘅改動唔好俾舊資料蓋過
+        version, gen = rep.version(sn), index.generation(sn)
+        # 只加唔改嘅 sheet 平時行 delta sync，成本跟新資料數量走，唔跟歷史總數
+        if sn in DELTA_SHEETS and not full and rep.is_synced(sn):
+            added = sync_tail(sn, version, gen)
+            if added is not None:
+                out[sn] = added
+                continue
+        fetch[sn] = (version, gen)
+    if not fetch: return out
+    batch = batch_get_sheets(list(fetch))
+    if batch is None: return out
+    for sn, records in batch.items():
+        version, gen = fetch[sn]
+        index.rebuild(sn, [r.get(sheet_key(sn), "") for r in records], gen=gen)
+        out[sn] = rep.replace(sn, records, version=version)
+    return out
+
+def sync_sheet(sheet_name, full=False):
+    return sync_sheets([sheet_name], full=full).get(sheet_name)
+
+@st.cache_resource
+def start_sync_worker():
+    def loop():
+        n = 0
+        while True:
+            try: sync_sheets(list(SCHEMAS), full=n % FULL_SYNC_EVERY == 0)
+            except Exception: pass
+            if n % FULL_SYNC_EVERY == 0:
+                try:
+                    if ARCHIVE_AUTO: archive_closed_periods()  # 過咗年就將舊年度搬去 Parquet
+                except Exception: pass
+            n += 1
+            time.sleep(SYNC_INTERVAL)
+    t = threading.Thread(target=loop, name="tim-team-sync", daemon=True)
+    t.start()
+    return t
+
+# 每張 sheet 獨立緩存：key 係 (sheet, version)，寫入只會令嗰張 sheet 失效 (version 由儲存後端提供)
+# 衍生欄位喺 snapshot 度計一次，之後所有 session 直接用，唔使每次 parse (timestamp 用 ISO8601，有冇微秒都照 parse)
+def derive_columns(sheet_name, df):
+    if sheet_name == "activities":
+        return df.assign(date_dt=pd.to_datetime(df['date'], errors='coerce'), timestamp_dt=pd.to_datetime(df['timestamp'], errors='coerce', format='ISO8601'),
+                         points_num=pd.to_numeric(df['points'], errors='coerce').fillna(0))
+    if sheet_name == "monthly_fyc":
+        return df.assign(month_key=df['month'].astype(str).str.strip(), amount_num=pd.to_numeric(df['amount'], errors='coerce').fillna(0))
+    return df
+
+# 每張 sheet 每個版本一份 snapshot，成個 process 所有 session 共用同一個 DataFrame (唔會逐個 session 複製)
+# ⚠️ 唯讀：要加欄位請用 df.assign(...) / .copy()，唔好直接 df[col] = ...
+@st.cache_resource(max_entries=16)
+def load_sheet(sheet_name, version):
+    get_metrics().cache_lookup(f"read_data.{sheet_name}", miss=True)
+    expected_cols = SCHEMAS.get(sheet_name, [])
+    df = pd.DataFrame(get_backend().records(sheet_name))
+    if df.empty or not set(expected_cols).issubset(df.columns):
+        for col in expected_cols:
+            if col not in df.columns: df[col] = ""
+        df = df[expected_cols]
+    return derive_columns(sheet_name, df)
+
+@timed
+def read_data(sheet_name):
+    get_metrics().cache_lookup(f"read_data.{sheet_name}")
+    backend = get_backend()
+    backend.prepare(sheet_name)
+    return load_sheet(sheet_name, backend.version(sheet_name))
+
+# 一次過準備幾張 sheet：冷 cache 只行一個 batch round trip，再逐張填 snapshot
+def read_many(*sheet_names):
+    backend = get_backend()
+    backend.prepare(*sheet_names)
+    return {sn: read_data(sn) for sn in sheet_names}
+
+# 行號索引：id (users 用 username) → Google Sheet 行號，UPDATE/DELETE 直接寫去對應 A1 範圍，唔使 ws.find
+class RowIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows, self.gen = {}, {}
+
+    def has(self, sheet_name): return sheet_name in self.rows
+
+    # 行號唔再可信：下次寫入前由 key 欄重建
+    def forget(self, sheet_name):
+        with self.lock:
+            self.rows.pop(sheet_name, None)
+            self.gen[sheet_name] = self.generation(sheet_name) + 1
+
+    def generation(self, sheet_name): return self.gen.get(sheet_name, 0)
+
+    # keys 係由第 2 行開始、按 sheet 次序嘅 key 欄；期間有寫入 (gen 變咗) 就唔用呢份舊資料
+    def rebuild(self, sheet_name, keys, gen=None):
+        idx = {}
+        for row, k in enumerate(keys, start=2): idx.setdefault(str(k), []).append(row)
+        with self.lock:
+            if gen is not None and self.generation(sheet_name) != gen: return
+            self.rows[sheet_name] = idx
+
+    def row(self, sheet_name, key):
+        with self.lock:
+            rows = self.rows.get(sheet_name, {}).get(str(key))
+            return min(rows) if rows else None
+
+    def appended(self, sheet_name, keys, start, gen=None):
+        with self.lock:
+            idx = self.rows.get(sheet_name)
+            if idx is None or (gen is not None and self.generation(sheet_name) != gen): return
+            for row, k in enumerate(keys, start=start): idx.setdefault(str(k), []).append(row)
+            self.gen[sheet_name] = self.generation(sheet_name) + 1
+
+    def renamed(self, sheet_name, old, new, row):
+        with self.lock:
+            idx = self.rows.get(sheet_name)
+            if idx is None: return
+            if row in idx.get(str(old), []):
+                idx[str(old)].remove(row)
+                if not idx[str(old)]: del idx[str(old)]
+            idx.setdefault(str(new), []).append(row)
+            self.gen[sheet_name] = self.generation(sheet_name) + 1
+
+    # 刪行之後，下面嘅行號減去上面刪咗幾多行；成批刪都只係行一次
+    def deleted(self, sheet_name, *rows):
+        dead = set(rows); gone = sorted(dead)
+        with self.lock:
+            idx = self.rows.get(sheet_name)
+            if idx is None: return
+            for k in list(idx):
+                kept = [r - bisect.bisect_left(gone, r) for r in idx[k] if r not in dead]
+                if kept: idx[k] = kept
+                else: del idx[k]
+            self.gen[sheet_name] = self.generation(sheet_name) + 1
+
+@st.cache_resource
+def get_row_index(): return RowIndex()
+
+def ensure_row_index(ws, sheet_name, headers):
+    index = get_row_index()
+    if not index.has(sheet_name) and sheet_key(sheet_name) in headers:
+        gen = index.generation(sheet_name)
+        keys = with_backoff(ws.col_values, headers.index(sheet_key(sheet_name)) + 1)[1:]
+        index.rebuild(sheet_name, [numericise(k) for k in keys], gen=gen)
+    return index
+
+# 寫入佇列 (write-behind)：UI 即刻寫本地副本，背景 thread 將一批改動合併成幾個 batch call 寫返 Google Sheet
+FLUSH_DELAY = 1.0
+FLUSH_RETRY_DELAY = 10
+RETRY_LIMIT = 5
+MAX_FLUSH_ATTEMPTS = 5
+
+def with_backoff(fn, *args, **kwargs):
+    for attempt in range(RETRY_LIMIT):
+        try: return fn(*args, **kwargs)
+        except APIError as e:
+            if getattr(e, "code", None) not in (429, 500, 502, 503) or attempt == RETRY_LIMIT - 1: raise
+            time.sleep(min(32, 2 ** attempt) + random.random())
+
+def get_headers(ws, sheet_name):
+    pool = get_sheet_pool()
+    if pool.headers.get(sheet_name): return pool.headers[sheet_name]
+    headers = with_backoff(ws.row_values, 1)
+    if not headers:
+        headers = SCHEMAS.get(sheet_name, [])
+        if headers: with_backoff(ws.append_row, headers)
+    pool.headers[sheet_name] = headers
+    return headers
+
+# 合併一批改動：同一行嘅 UPDATE 後寫為準；未寫出去嘅 INSERT 直接改 row 內容；INSERT 後 DELETE 兩個一齊取消
+def plan_writes(ops):
+    appends, updates, deletes = {}, {}, {}
+    for op in ops:
+        k = (op["sheet"], op["key"])
+        pending = next((a for a in appends.get(op["sheet"], []) if a["key"] == op["key"]), None)
+        if op["kind"] == "append": appends.setdefault(op["sheet"], []).append(op)
+        elif op["kind"] == "update":
+            if pending: pending["row"].update({c: str(v) for c, v in op["row"].items() if c in pending["row"]})
+            elif k in updates: updates[k]["row"].update(op["row"])
+            elif k not in deletes: updates[k] = op
+        elif op["kind"] == "delete":
+            if pending: appends[op["sheet"]].remove(pending)
+            else: updates.pop(k, None); deletes[k] = op
+    return list(updates.values()), list(deletes.values()), appends
+
+class WriteQueue:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.ops, self.busy, self.errors = [], set(), []
+        self.unconfirmed, self.resync = [], set()  # append 咗但未確認 id 嘅 batch；登記失敗、要由 Google Sheet 全表同步返嘅 sheet
+
+    def put(self, kind, sheet_name, key, row):
+        with self.lock: self.ops.append({"kind": kind, "sheet": sheet_name, "key": str(key), "row": dict(row), "tries": 0})
+        self.wake.set()
+
+    def pending(self, sheet_name):
+        with self.lock: return sheet_name in self.busy or any(op["sheet"] == sheet_name for op in self.ops) or any(u[0] == sheet_name for u in self.unconfirmed)
+
+    def run(self):
+        while True:
+            self.wake.wait(); time.sleep(FLUSH_DELAY); self.wake.clear()
+            if not self.flush(): self.wake.set(); time.sleep(FLUSH_RETRY_DELAY)
+
+    @timed
+    def flush(self):
+        with self.flush_lock:
+            with self.lock: unconfirmed, self.unconfirmed = self.unconfirmed, []
+            for args in unconfirmed: self.confirm(*args)
+            with self.lock:
+                ops, self.ops = self.ops, []
+                self.busy = {op["sheet"] for op in ops}
+            updates, deletes, appends = plan_writes(ops)
+            jobs = [(self.write_updates, updates)] if updates else []
+            if deletes: jobs.append((self.write_deletes, deletes))
+            jobs += [(self.write_appends, batch) for batch in appends.values() if batch]
+            for i, (job, batch) in enumerate(jobs):
+                try: job(batch)
+                except Exception as e:
+                    self.requeue([op for _, b in jobs[i:] for op in b], e)
+                    self.resync_sheets()
+                    return False
+            with self.lock: self.busy = set()
+            self.resync_sheets()
+            return not self.unconfirmed
+
+    def resync_sheets(self):
+        for sn in list(self.resync):
+            try:
+                if sync_sheet(sn, full=True) is not None: self.resync.discard(sn)
+            except Exception: pass
+
+    # 失敗嘅改動放返去隊頭；試咗太多次就放棄，再由 Google Sheet 重新同步本地副本
+    def requeue(self, ops, error):
+        if is_stale_handle(error): get_sheet_pool().refresh(reauth=getattr(error, "code", None) == 401)
+        dropped = set()
+        with self.lock:
+            retry = []
+            for op in ops:
+                op["tries"] += 1
+                if op["tries"] < MAX_FLUSH_ATTEMPTS: retry.append(op)
+                else: dropped.add(op["sheet"]); self.errors.append((str(datetime.datetime.now()), op["kind"], op["sheet"], op["key"], str(error)))
+            self.ops[:0] = retry
+            self.busy = set()
+        for sn in dropped:
+            try: sync_sheet(sn)
+            except Exception: pass
+
+    def write_updates(self, ops):
+        sh, data, headers = get_spreadsheet(), [], {}
+        for op in ops:
+            ws = get_sheet(op["sheet"])
+            if op["sheet"] not in headers: headers[op["sheet"]] = get_headers(ws, op["sheet"])
+            row = ensure_row_index(ws, op["sheet"], headers[op["sheet"]]).row(op["sheet"], op["key"])
+            if not row: continue
+            for col, val in op["row"].items():
+                if col in headers[op["sheet"]]:
+                    data.append({"range": f"'{op['sheet']}'!{rowcol_to_a1(row, headers[op['sheet']].index(col) + 1)}", "values": [[val]]})
+        if data: with_backoff(sh.values_batch_update, {"valueInputOption": "USER_ENTERED", "data": data})
+
+    def write_deletes(self, ops):
+        sh, rows, headers = get_spreadsheet(), [], {}
+        for op in ops:
+            ws = get_sheet(op["sheet"])
+            if op["sheet"] not in headers: headers[op["sheet"]] = get_headers(ws, op["sheet"])
+            row = ensure_row_index(ws, op["sheet"], headers[op["sheet"]]).row(op["sheet"], op["key"])
+            if row: rows.append((op["sheet"], ws.id, row))
+        # 由下而上刪，前面嘅行號先唔會郁
+        rows = sorted(set(rows), key=lambda r: -r[2])
+        requests = [{"deleteDimension": {"range": {"sheetId": sid, "dimension": "ROWS", "startIndex": row - 1, "endIndex": row}}} for _, sid, row in rows]
+        if requests: with_backoff(sh.batch_update, {"requests": requests})
+        for sheet_name in {r[0] for r in rows}: get_row_index().deleted(sheet_name, *[row for sn, _, row in rows if sn == sheet_name])
+
+    def write_appends(self, ops):
+        sheet_name = ops[0]["sheet"]; ws = get_sheet(sheet_name)
+        headers = get_headers(ws, sheet_name)
+        index = ensure_row_index(ws, sheet_name, headers)
+        res = with_backoff(ws.append_rows, [[str(op["row"].get(h, "")) for h in headers] for op in ops])
+        # append_rows 返咗就當寫咗：之後出錯唔可以成批重試 (會 append 多次)；id 確認自己再試，行號登記唔到就全表同步
+        try:
+            start = a1_to_rowcol(res["updates"]["updatedRange"].split("!")[-1].split(":")[0])[0]
+            index.appended(sheet_name, [op["key"] for op in ops], start)
+        except Exception as e: return self.lost(sheet_name, ops, e)
+        if sheet_name in ID_SHEETS and "id" in headers: self.confirm(sheet_name, start, headers.index("id") + 1, ops)
+
+    def confirm(self, sheet_name, start, id_col, ops, tries=0):
+        try: confirm_ids(get_sheet(sheet_name), sheet_name, start, id_col, ops)
+        except Exception as e:
+            if is_stale_handle(e): get_sheet_pool().refresh(reauth=getattr(e, "code", None) == 401)
+            if tries + 1 < MAX_FLUSH_ATTEMPTS:
+                with self.lock: self.unconfirmed.append((sheet_name, start, id_col, ops, tries + 1))
+            else: self.lost(sheet_name, ops, e)
+
+    def lost(self, sheet_name, ops, error):
+        get_row_index().forget(sheet_name)
+        with self.lock:
+            self.errors += [(str(datetime.datetime.now()), "confirm", sheet_name, op["key"], str(error)) for op in ops]
+            self.resync.add(sheet_name)
+
+@st.cache_resource
+def get_write_queue():
+    wq = WriteQueue()
+    threading.Thread(target=wq.run, name="tim-team-writer", daemon=True).start()
+    atexit.register(wq.flush)
+    return wq
+
+# 對返 append 落去嗰幾行上面嘅 id：另一個 worker 同時間用咗同一個號就改用新號
+def confirm_ids(ws, sheet_name, start, id_col, ops):
+    if start <= 2: return
+    col = rowcol_to_a1(1, id_col)[:-1]
+    above = with_backoff(ws.get_values, f"{col}{max(2, start - ID_CHECK_ROWS)}:{col}{start - 1}")
+    taken = [int(r[0]) for r in above if r and str(r[0]).isdigit()]
+    if not taken or max(taken) < min(int(op["key"]) for op in ops): return
+    rep, data = get_replica(), []
+    for i, op in enumerate(ops):
+        new_id = rep.next_id(sheet_name, at_least=max(taken) + 1)
+        data.append({"range": f"{col}{start + i}", "values": [[new_id]]})
+        rep.update(sheet_name, op["key"], {"id": new_id}); get_row_index().renamed(sheet_name, op["key"], new_id, start + i); op["key"] = str(new_id)
+    with_backoff(ws.batch_update, data)
+
+# --- 儲存後端：sheets (Google Sheet + 本地副本)、sqlite (本地資料庫)、memory (測試 / benchmark 用) ---
+# 喺 secrets 嘅 [storage] 或者環境變數 TIM_BACKEND / TIM_SQLITE_PATH 揀
+DEFAULT_USERS = [('Admin', 'admin123', 'Leader'), ('Tim', '1234', 'Member'), ('Oscar', '1234', 'Member')]
+
+def get_setting(name, default):
+    try:
+        if "storage" in st.secrets and name in st.secrets["storage"]: return st.secrets["storage"][name]
+    except Exception: pass
+    return os.environ.get(f"TIM_{name.upper()}", default)
+
+# 密碼存 salted PBKDF2："pbkdf2_sha256$<次數>$<salt>$<hash>"；舊嘅明文密碼登入成功 / migrate 時升級
+PASSWORD_SCHEME = "pbkdf2_sha256"
+PASSWORD_ITERATIONS = 200_000
+
+def hash_password(p, salt=None, iterations=PASSWORD_ITERATIONS):
+    salt = salt or os.urandom(16).hex()
+    digest = hashlib.pbkdf2_hmac("sha256", str(p).encode(), salt.encode(), iterations).hex()
+    return f"{PASSWORD_SCHEME}${iterations}${salt}${digest}"
+
+def is_hashed(stored): return str(stored).startswith(PASSWORD_SCHEME + "$")
+
+def verify_password(stored, p):
+    stored = str(stored)
+    if not is_hashed(stored): return hmac.compare_digest(stored.encode(), str(p).encode())
+    try: _, iterations, salt, _ = stored.split("$")
+    except ValueError: return False
+    return hmac.compare_digest(hash_password(p, salt, int(iterations)).encode(), stored.encode())
+
+def default_user(u):
+    url = f"https://ui-avatars.com/api/?name={u[0]}&background=d4af37&color=fff&size=128"
+    return {"username": u[0], "password": hash_password(u[1]), "role": u[2], "team": "Tim Team", "recruit": 0, "avatar": url, "last_read": ""}
+
+class SheetsBackend:
+    name = "sheets"
+
+    def ready(self, sheet_name): return get_replica().is_synced(sheet_name)
+
+    # 第一次開機本地未有資料先要等 Google Sheet；未同步過嘅 sheet 一次過攞埋，唔使逐張等
+    def prepare(self, *sheet_names):
+        start_sync_worker()
+        for attempt in range(3):
+            cold = [sn for sn in dict.fromkeys(sheet_names + tuple(SCHEMAS)) if not self.ready(sn)]
+            if not any(sn in cold for sn in sheet_names): break
+            try:
+                if not sync_sheets(cold): break
+            except Exception:
+                time.sleep(1)
+
+    def version(self, sheet_name): return get_replica().version(sheet_name)
+
+    def records(self, sheet_name): return get_replica().load(sheet_name)
+
+    def insert(self, sheet_name, data_dict):
+        if not get_gs_client(): return
+        rep = get_replica()
+        if sheet_name in ID_SHEETS:
+            if not rep.is_synced(sheet_name): sync_sheet(sheet_name)
+            data_dict['id'] = rep.next_id(sheet_name, at_least=archived_max_id(sheet_name) + 1)
+        row = {h: str(data_dict.get(h, "")) for h in SCHEMAS.get(sheet_name, data_dict)}
+        rep.insert(sheet_name, row)
+        get_write_queue().put("append", sheet_name, row.get(sheet_key(sheet_name), ""), row)
+
+    def update(self, sheet_name, key, changes):
+        if not get_gs_client(): return
+        get_replica().update(sheet_name, key, changes)
+        get_write_queue().put("update", sheet_name, key, changes)
+
+    def delete(self, sheet_name, key):
+        if not get_gs_client(): return
+        get_replica().delete(sheet_name, key)
+        get_write_queue().put("delete", sheet_name, key, {})
+
+    # 大批刪除 (封存用)：本地一個 transaction，Google Sheet 嗰邊照樣由 write queue 合併成 batch
+    def delete_many(self, sheet_name, keys):
+        if not get_gs_client(): return
+        get_replica().delete_many(sheet_name, keys)
+        for key in keys: get_write_queue().put("delete", sheet_name, key, {})
+
+    def bootstrap(self): init_db_gs()
+
+class SQLiteBackend:
+    name = "sqlite"
+    INDEXES = {"users": [["username"]], "activities": [["username"], ["date"], ["timestamp"]], "monthly_fyc": [["username", "month"], ["month"]], "story_ammo": [["username"], ["date"], ["category"]], "weekly_ledger": [["week"]]}
+
+    def __init__(self, path):
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # 冇宣告類型嘅欄位會照存入嘅類型返，同 get_all_records 出嚟嘅 int / str 一致
+        for sn, cols in SCHEMAS.items():
+            defs = ", ".join("id INTEGER PRIMARY KEY AUTOINCREMENT" if c == "id" else f'"{c}"' for c in cols)
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{sn}" ({defs})')
+            for idx in self.INDEXES.get(sn, []):
+                self.conn.execute(f'CREATE INDEX IF NOT EXISTS "{sn}_{"_".join(idx)}" ON "{sn}" ({", ".join(idx)})')
+        self.conn.execute("CREATE TABLE IF NOT EXISTS versions (sheet TEXT PRIMARY KEY, version INTEGER)")
+        self.conn.commit()
+
+    def ready(self, sheet_name): return True
+
+    def prepare(self, *sheet_names): pass
+
+    def version(self, sheet_name):
+        with self.lock: row = self.conn.execute("SELECT version FROM versions WHERE sheet = ?", (sheet_name,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, sheet_name):
+        self.conn.execute("INSERT INTO versions VALUES (?, 1) ON CONFLICT(sheet) DO UPDATE SET version = version + 1", (sheet_name,))
+
+    def records(self, sheet_name):
+        cols = SCHEMAS[sheet_name]
+        with self.lock: rows = self.conn.execute(f'SELECT {", ".join(chr(34) + c + chr(34) for c in cols)} FROM "{sheet_name}" ORDER BY rowid').fetchall()
+        return [dict(zip(cols, r)) for r in rows]
+
+    def insert(self, sheet_name, data_dict):
+        cols = [c for c in SCHEMAS[sheet_name] if c != "id"]
+        with self.lock, self.conn:
+            cur = self.conn.execute(f'INSERT INTO "{sheet_name}" ({", ".join(chr(34) + c + chr(34) for c in cols)}) VALUES ({", ".join("?" * len(cols))})', [numericise(str(data_dict.get(c, ""))) for c in cols])
+            if sheet_name in ID_SHEETS: data_dict['id'] = cur.lastrowid
+            self.bump(sheet_name)
+
+    def update(self, sheet_name, key, changes):
+        changes = {c: v for c, v in changes.items() if c in SCHEMAS[sheet_name]}
+        if not changes: return
+        k = sheet_key(sheet_name)
+        with self.lock, self.conn:
+            self.conn.execute(f'UPDATE "{sheet_name}" SET {", ".join(chr(34) + c + chr(34) + " = ?" for c in changes)} WHERE rowid = (SELECT MIN(rowid) FROM "{sheet_name}" WHERE "{k}" = ?)', [numericise(str(v)) for v in changes.values()] + [numericise(str(key))])
+            self.bump(sheet_name)
+
+    def delete(self, sheet_name, key):
+        k = sheet_key(sheet_name)
+        with self.lock, self.conn:
+            self.conn.execute(f'DELETE FROM "{sheet_name}" WHERE rowid = (SELECT MIN(rowid) FROM "{sheet_name}" WHERE "{k}" = ?)', (numericise(str(key)),))
+            self.bump(sheet_name)
+
+    def delete_many(self, sheet_name, keys):
+        k = sheet_key(sheet_name)
+        with self.lock, self.conn:
+            self.conn.executemany(f'DELETE FROM "{sheet_name}" WHERE rowid = (SELECT MIN(rowid) FROM "{sheet_name}" WHERE "{k}" = ?)', [(numericise(str(key)),) for key in keys])
+            self.bump(sheet_name)
+
+    def bootstrap(self):
+        existing = {r["username"] for r in self.records("users")}
+        for u in DEFAULT_USERS:
+            if u[0] not in existing: self.insert("users", default_user(u))
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables = {sn: [] for sn in SCHEMAS}
+        self.versions, self.max_ids = {}, {}
+
+    def ready(self, sheet_name): return True
+
+    def prepare(self, *sheet_names): pass
+
+    def version(self, sheet_name): return self.versions.get(sheet_name, 0)
+
+    def bump(self, sheet_name): self.versions[sheet_name] = self.version(sheet_name) + 1
+
+    def records(self, sheet_name):
+        with self.lock: return [dict(r) for r in self.tables.get(sheet_name, [])]
+
+    def find(self, sheet_name, key):
+        k = sheet_key(sheet_name)
+        return next((r for r in self.tables.get(sheet_name, []) if str(r.get(k)) == str(key)), None)
+
+    def insert(self, sheet_name, data_dict):
+        with self.lock:
+            if sheet_name in ID_SHEETS:
+                self.max_ids[sheet_name] = max(self.max_ids.get(sheet_name, 0), archived_max_id(sheet_name)) + 1
+                data_dict['id'] = self.max_ids[sheet_name]
+            self.tables.setdefault(sheet_name, []).append({c: numericise(str(data_dict.get(c, ""))) for c in SCHEMAS.get(sheet_name, data_dict)})
+            self.bump(sheet_name)
+
+    def update(self, sheet_name, key, changes):
+        with self.lock:
+            row = self.find(sheet_name, key)
+            if row: row.update({c: numericise(str(v)) for c, v in changes.items() if c in row})
+            self.bump(sheet_name)
+
+    def delete(self, sheet_name, key):
+        with self.lock:
+            row = self.find(sheet_name, key)
+            if row: self.tables[sheet_name].remove(row)
+            self.bump(sheet_name)
+
+    def delete_many(self, sheet_name, keys):
+        k, keys = sheet_key(sheet_name), {str(key) for key in keys}
+        with self.lock:
+            self.tables[sheet_name] = [r for r in self.tables.get(sheet_name, []) if str(r.get(k)) not in keys]
+            self.bump(sheet_name)
+
+    def bootstrap(self):
+        for u in DEFAULT_USERS:
+            if not self.find("users", u[0]): self.insert("users", default_user(u))
+
+@st.cache_resource
+def get_backend():
+    kind = get_setting("backend", "sheets")
+    if kind == "sqlite": return SQLiteBackend(get_setting("sqlite_path", "tim_team.db"))
+    if kind == "memory": return MemoryBackend()
+    return SheetsBackend()
+
+def run_query_gs(action, sheet_name, data_dict=None, row_id=None):
+    backend, stats = get_backend(), get_rollups()
+    try:
+        with stats.lock:
+            before = backend.version(sheet_name)
+            if action == "INSERT": backend.insert(sheet_name, data_dict)
+            elif action == "UPDATE": backend.update(sheet_name, row_id, data_dict)
+            elif action == "DELETE": backend.delete(sheet_name, row_id)
+            after = backend.version(sheet_name)
+            stats.record(action, sheet_name, before, after, data_dict, row_id)
+            for index in (get_story_index(), get_inbox()):
+                with index.lock: index.record(action, sheet_name, before, after, data_dict, row_id)
+    except Exception as e: st.error(f"操作失敗: {e}")
+
+def init_db_gs():
+    try:
+        sh = get_spreadsheet()
+        if not sh: return
+        pool = get_sheet_pool()
+        with pool.lock: pool.worksheets.update({ws.title: ws for ws in sh.worksheets()})
+        for sn in SCHEMAS: get_sheet(sn)  # 冇就 add_worksheet
+        # 一個 batch call 攞晒 users 第一欄同其他 sheet 嘅 header
+        others = [sn for sn in SCHEMAS if sn != "users"]
+        ranges = sh.values_batch_get(["'users'!A:A"] + [f"'{sn}'!1:1" for sn in others]).get("valueRanges", [])
+        existing = [r[0] for r in ranges[0].get("values", []) if r]
+        if not existing:
+            get_sheet("users").append_row(SCHEMAS["users"])
+            existing = ["username"]
+        missing = [list(default_user(u).values()) for u in DEFAULT_USERS if u[0] not in existing]
+        if missing: get_sheet("users").append_rows(missing); sync_sheet("users")
+        for sn, vr in zip(others, ranges[1:]):
+            # 🔥 全新 Headers
+            if not vr.get("values"): get_sheet(sn).append_row(SCHEMAS[sn])
+    except Exception: pass
+
+SCHEMA_VERSION = hashlib.sha1(json.dumps(SCHEMAS, sort_keys=True).encode()).hexdigest()[:8]
+
+# 建表 / 預設用戶 / 舊密碼升級：每個 process 每個 schema 版本只做一次，喺背景 thread 跑，唔會阻住每次 rerun
+def bootstrap_process():
+    get_backend().bootstrap()
+    migrate_passwords()
+
+@st.cache_resource
+def init_db(schema_version):
+    t = threading.Thread(target=bootstrap_process, name="tim-team-bootstrap", daemon=True)
+    t.start()
+    return t
+
+# --- 4. 核心邏輯 ---
+
+@timed
+def get_clean_users():
+    df = read_data("users")
+    if df.empty: return pd.DataFrame(columns=["username", "password", "role", "team", "recruit", "avatar", "last_read"])
+    df = df.drop_duplicates(subset=['username'], keep='first')
+    return df[~df['username'].isin(INACTIVE_MEMBERS)]
+
+# username → user record，每個 users version 建一次；登入 / 改資料直接查 dict，唔使成張表 scan
+@st.cache_resource(max_entries=2)
+def load_user_index(version):
+    get_metrics().cache_lookup("user_index", miss=True)
+    df, index = read_data("users"), {}
+    if df.empty: return index
+    for u, rec in zip(df['username'].astype(str), df.to_dict('records')): index.setdefault(u, rec)
+    return index
+
+def get_user_index():
+    backend = get_backend()
+    backend.prepare("users")
+    get_metrics().cache_lookup("user_index")
+    return load_user_index(backend.version("users"))
+
+@timed
+def login(u, p):
+    init_db(SCHEMA_VERSION).join(timeout=15)  # 全新資料庫要等預設用戶建好
+    rec = get_user_index().get(str(u))
+    if not rec or u in INACTIVE_MEMBERS or not verify_password(rec.get('password', ''), p): return []
+    if not is_hashed(rec['password']): update_pw(u, p)
+    return [[rec.get(c, "") for c in SCHEMAS["users"]]]
+
+# 頭像庫：上載嘅相按內容 hash 存成幾個尺寸嘅 JPEG，users sheet 只記 "avatar:<hash>"，經 Streamlit static serving 俾 browser cache
+AVATAR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "avatars")
+AVATAR_SIZES = (48, 128, 256)
+AVATAR_REF = "avatar:"
+# 頭像庫只係本地 disk：預設 "sheet" 照舊將細圖 base64 存返入 users sheet；AVATAR_DIR 喺持久 disk (有備份) 先好設 "disk"
+AVATAR_STORE = get_setting("avatar_store", "sheet")
+AVATAR_MAX_BYTES = 15 * 1024 * 1024
+AVATAR_MAX_PIXELS = 50_000_000  # 淨係睇 header 判斷，超過就唔 decode
+AVATAR_MAX_FULL_PIXELS = 16_000_000  # 冇 draft 嘅格式 (PNG 等) 要成張 decode，16MP RGBA 已經 64MB
+AVATAR_WORKERS = 2
+
+def avatar_file(digest, size): return os.path.join(AVATAR_DIR, f"{digest}_{size}.jpg")
+
+# 由最大嗰個尺寸開始，置中裁成正方形再逐級縮細，一次過出晒所有尺寸
+def store_avatar(image):
+    sizes = sorted(AVATAR_SIZES, reverse=True) if AVATAR_STORE == "disk" else [128]  # sheet 模式淨係存 128 嗰張 data URL，其他尺寸唔使 encode
+    image, blobs = ImageOps.fit(image, (sizes[0],) * 2, Image.Resampling.LANCZOS), {}
+    for size in sizes:
+        image = image if image.width == size else image.resize((size, size), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        image.save(buf, format='JPEG', quality=85)
+        blobs[size] = buf.getvalue()
+    if AVATAR_STORE != "disk": return "data:image/jpeg;base64," + base64.b64encode(blobs[128]).decode()
+    digest = hashlib.sha256(blobs[max(AVATAR_SIZES)]).hexdigest()[:20]
+    os.makedirs(AVATAR_DIR, exist_ok=True)
+    for size, blob in blobs.items():
+        path = avatar_file(digest, size)
+        if not os.path.exists(path):
+            with open(path + ".tmp", "wb") as fh: fh.write(blob)
+            os.replace(path + ".tmp", path)
+    return AVATAR_REF + digest
+
+# 上載嘅原圖：先睇 header 限 byte / pixel 數，JPEG 用 draft 喺 decode 時直接縮 (12MP 相只 decode 到 1/8)，
+# 其他格式上限細好多；decode 完即刻縮細，先至跟 EXIF 轉正、轉 RGB (都係喺細圖度複製)；失敗回 None
+def ingest_avatar(data):
+    try:
+        if len(data) > AVATAR_MAX_BYTES: return None
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > AVATAR_MAX_PIXELS: return None
+        edge = max(AVATAR_SIZES) * 2  # 留兩倍位俾裁剪同 LANCZOS 縮圖
+        # draft 揀兩邊都唔細過目標嘅最細 DCT 比例；目標用最大尺寸 (唔係 edge)，4000x3000 先會去到 1/8 (500x375)
+        if image.format == "JPEG": image.draft("RGB", (max(AVATAR_SIZES),) * 2)
+        elif image.width * image.height > AVATAR_MAX_FULL_PIXELS: return None
+        if image.mode in ("1", "P"): image = image.convert("RGB")  # palette 圖 resize 只會用 NEAREST
+        scale = edge / min(image.size)
+        if scale < 1: image = image.resize((round(image.width * scale), round(image.height * scale)), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB": image = image.convert("RGB")
+        return store_avatar(image)
+    except Exception: return None
+
+# 處理頭像嘅 worker pool：唔阻住 Streamlit script thread，同一時間最多 AVATAR_WORKERS 張相喺 memory
+@st.cache_resource
+def get_avatar_pool(): return ThreadPoolExecutor(max_workers=AVATAR_WORKERS, thread_name_prefix="tim-team-avatar")
+
+# inline=False：base64 頭像唔直接塞入 HTML (動態牆每張卡都會帶成張圖)，用返 ui-avatars
+def avatar_url(ref, username="", size=128, inline=True):
+    ref = str(ref or "")
+    if ref.startswith(AVATAR_REF):
+        digest = ref[len(AVATAR_REF):]
+        size = min([s for s in AVATAR_SIZES if s >= size] or [max(AVATAR_SIZES)])
+        if digest.isalnum() and os.path.exists(avatar_file(digest, size)): return f"/app/static/avatars/{digest}_{size}.jpg"
+    elif ref.startswith("http") or (inline and ref.startswith("data:image")): return ref
+    return "https://ui-avatars.com/api/?background=random&color=fff&name=" + urllib.parse.quote(str(username))
+
+def with_avatar_urls(df, size=48):
+    if not df.empty and 'avatar' in df.columns: df['avatar'] = [avatar_url(a, u, size) for u, a in zip(df['username'], df['avatar'])]
+    return df
+
+# 舊資料：users sheet 入面嘅 base64 頭像搬入頭像庫，每個 process 做一次；avatar_store 唔係 "disk" 就唔郁 (sheet 入面係唯一副本)
+@st.cache_resource
+def migrate_avatars():
+    if AVATAR_STORE != "disk": return 0
+    users, moved = read_data("users"), 0
+    for u, a in zip(users['username'], users['avatar']):
+        if isinstance(a, str) and a.startswith("data:image"):
+            try: ref = ingest_avatar(base64.b64decode(a.split(",", 1)[1]))
+            except Exception: continue
+            if ref: update_avt(u, ref); moved += 1
+    return moved
+
+def proc_img(f): return get_avatar_pool().submit(ingest_avatar, f.getvalue())
+
+# 頭像喺 worker 處理緊就每秒睇一次，搞掂先 rerun 成頁
+@st.fragment(run_every=1)
+def avatar_upload_status():
+    job = st.session_state.get('avatar_job')
+    if job is None: return
+    if not job.done(): st.info("⏳ 處理緊頭像..."); return
+    del st.session_state['avatar_job']
+    ref = job.result()
+    if not ref: st.error("圖片讀唔到或者太大 (上限 15MB / 50MP)"); return
+    update_avt(st.session_state['user'], ref); st.session_state['avatar'] = ref; st.toast("Avatar Updated!", icon="✅"); st.rerun()
+
+def update_avt(u, i):
+    if u in get_user_index(): run_query_gs("UPDATE", "users", {"avatar": i}, row_id=u)
+
+def update_pw(u, p):
+    if u in get_user_index(): run_query_gs("UPDATE", "users", {"password": hash_password(p)}, row_id=u)
+
+# 舊資料：明文密碼一次過換成 hash，每個 process 喺 bootstrap thread 做一次
+@st.cache_resource
+def migrate_passwords():
+    plain = {u: rec.get('password', '') for u, rec in get_user_index().items() if not is_hashed(rec.get('password', ''))}
+    for u, p in plain.items(): update_pw(u, p)
+    return len(plain)
+
+def add_act(u, d, t, n):
+    if is_archived_year("activities", pd.Timestamp(d).year) or is_settled_week(d): return False  # 已封存年度 / 已結算嘅週唯讀
+    pts = 8 if "出code" in t else 5 if "簽單" in t else 3 if "報考試" in t else 2 if "傾" in t else 1
+    run_query_gs("INSERT", "activities", {"username": u, "date": str(d), "type": t, "points": pts, "note": n, "timestamp": str(datetime.datetime.now())})
+    return True
+
+# 🔥 更新傳入參數
+def add_ammo(u, d, cat, title, knowledge, story_context, nightmare, dream, scenario):
+    run_query_gs("INSERT", "story_ammo", {
+        "username": u, "date": str(d), "category": cat, 
+        "title": title, "knowledge": knowledge, "story_context": story_context, 
+        "nightmare": nightmare, "dream": dream, "scenario": scenario, 
+        "timestamp": str(datetime.datetime.now())
+    })
+
+def upd_fyc(u, m, a):
+    df = read_data("monthly_fyc")
+    exist = df[(df['username'] == u) & (df['month_key'] == str(m))]
+    if not exist.empty: run_query_gs("UPDATE", "monthly_fyc", {"amount": a}, row_id=exist.iloc[0]['id'])
+    elif str(m)[:4].isdigit() and is_archived_year("monthly_fyc", int(str(m)[:4])): return False  # 已封存年度唯讀
+    else: run_query_gs("INSERT", "monthly_fyc", {"username": u, "month": str(m), "amount": a})
+    return True
+
+def upd_rec(u, a):
+    if u in get_user_index(): run_query_gs("UPDATE", "users", {"recruit": a}, row_id=u)
+
+def del_act(id): run_query_gs("DELETE", "activities", row_id=id)
+
+@st.cache_resource(max_entries=4)
+def load_all_act(version):
+    df = read_data("activities")
+    if df.empty: return pd.DataFrame(columns=["id", "username", "date", "type", "points", "note", "timestamp", "timestamp_dt"])
+    df = df.assign(date=df['date_dt'])
+    df = df.drop_duplicates(subset=['username', 'date', 'type', 'note'], keep='first')
+    return df[~df['username'].isin(INACTIVE_MEMBERS)].sort_values(by='date', ascending=False)
+
+@timed
+def get_all_act():
+    backend = get_backend(); backend.prepare("activities")
+    return load_all_act(backend.version("activities"))
+
+# Team Feed 分頁：只攞頭 limit 張卡，日期 / 時間 / 頭像成頁一次過處理
+@timed
+def get_feed_page(users_df, filter_user, limit):
+    acts = get_all_act()
+    if filter_user: acts = acts[acts['username'].isin(filter_user)]
+    page = acts.head(limit)[['username', 'date', 'type', 'note', 'timestamp', 'timestamp_dt']].copy()
+    if page.empty: return page, 0
+    avatars = dict(zip(users_df['username'], users_df['avatar']))
+    page['act_date'] = page['date'].dt.strftime('%Y-%m-%d').fillna("")
+    page['act_time'] = page['timestamp_dt'].dt.strftime('%H:%M').fillna("")  # snapshot 已經用 ISO8601 逐行 parse 好
+    page['avatar_url'] = [avatar_url(a, u, 48, inline=False) for u, a in zip(page['username'], page['username'].map(avatars))]
+    page['note'] = page['note'].astype(str).str.replace(chr(10), '<br>')
+    return page, len(acts)
+
+# --- 排行榜統計引擎：parse 一次建立每人 日 / 週 / 月 / 季 counter，之後每次寫入 O(1) 更新，所有排行榜都讀呢度 ---
+ACT_PERIODS = ["all", "date", "week", "month", "quarter"]
+FYC_PERIODS = ["all", "month", "quarter"]
+
+def bump_counter(table, period, user, value, n):
+    cell = table.setdefault(period, {}).setdefault(user, [0, 0])
+    cell[0] += value; cell[1] += n
+    if cell[1] == 0:
+        del table[period][user]
+        if not table[period]: del table[period]
+
+def act_periods(date):
+    if pd.isna(date): return {"all": "all"}
+    d = pd.Timestamp(date).normalize()
+    return {"all": "all", "date": d, "week": d - pd.Timedelta(days=d.weekday()), "month": d.to_period("M"), "quarter": d.to_period("Q")}
+
+def month_quarter(month):
+    m = str(month).strip()
+    return f"{m[:4]}Q{(int(m[5:7]) - 1) // 3 + 1}" if len(m) >= 7 and m[:4].isdigit() and m[5:7].isdigit() and 1 <= int(m[5:7]) <= 12 else None
+
+def fyc_periods(month):
+    m = str(month).strip(); q = month_quarter(m)
+    return {"all": "all", "month": m, "quarter": q} if q else {"all": "all", "month": m}
+
+def to_number(v, cast):
+    v = pd.to_numeric(v, errors='coerce')
+    return cast(0) if pd.isna(v) else cast(v)
+
+def act_row(r): return (str(r['username']), pd.to_datetime(r['date'], errors='coerce'), to_number(r['points'], int))
+
+def fyc_row(r): return (str(r['username']), str(r['month']).strip(), to_number(r['amount'], float))
+
+def rollup_frame(sheet_name, df, names=None):
+    names = names or pd.CategoricalDtype(sorted(set(df['username'].astype(str))))
+    if sheet_name == "monthly_fyc":
+        month = df['month_key']
+        return pd.DataFrame({
+            'id': df['id'].astype(str), 'username': df['username'].astype(str).astype(names), 'month': month,
+            'quarter': month.map(month_quarter), 'all': "all",
+            'amount': df['amount_num'],
+        })
+    date = df['date_dt'].dt.normalize()
+    return pd.DataFrame({
+        'id': df['id'].astype(str), 'username': df['username'].astype(str).astype(names), 'all': "all", 'date': date,
+        'week': date - pd.to_timedelta(date.dt.weekday, unit='D'), 'month': date.dt.to_period('M'), 'quarter': date.dt.to_period('Q'),
+        'points': df['points_num'].astype('int32'),
+    })
+
+def period_totals(df, value, periods):
+    table = {}
+    for period in periods:
+        table[period] = {}
+        g = df.dropna(subset=[period]).groupby([period, 'username'], observed=True)[value].agg(['sum', 'count'])
+        for (key, user), total, n in zip(g.index, g['sum'].tolist(), g['count'].tolist()):
+            table[period].setdefault(key, {})[str(user)] = [total, n]
+    return table
+
+class TeamStats:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.versions = {}  # 而家反映緊邊個資料版本；同儲存後端唔夾就全部重建
+        self.act, self.fyc, self.act_rows, self.fyc_rows = {k: {} for k in ACT_PERIODS}, {k: {} for k in FYC_PERIODS}, {}, {}
+
+    # 全量重建：每張 sheet parse 一次做 typed columns，再 groupby 成 counter；已封存年度用 Parquet 入面預先計好嘅總數
+    def rebuild(self, fyc_df, act_df, versions, archive=None):
+        if archive: fyc_df, act_df = archive.live("monthly_fyc", fyc_df), archive.live("activities", act_df)
+        names = pd.CategoricalDtype(sorted(set(fyc_df['username'].astype(str)) | set(act_df['username'].astype(str))))
+        fyc, act = rollup_frame("monthly_fyc", fyc_df, names), rollup_frame("activities", act_df, names)
+        self.act, self.fyc = period_totals(act, 'points', ACT_PERIODS), period_totals(fyc, 'amount', FYC_PERIODS)
+        if archive: archive.merge_into(self.act, self.fyc)
+        self.act_rows = dict(zip(act['id'], zip(act['username'].astype(str), act['date'], act['points'].tolist())))
+        self.fyc_rows = dict(zip(fyc['id'], zip(fyc['username'].astype(str), fyc['month'], fyc['amount'].tolist())))
+        self.versions = dict(versions)
+
+    def add_act(self, row, sign):
+        user, date, points = row
+        for period, key in act_periods(date).items(): bump_counter(self.act[period], key, user, sign * points, sign)
+
+    def add_fyc(self, row, sign):
+        user, month, amount = row
+        for period, key in fyc_periods(month).items(): bump_counter(self.fyc[period], key, user, sign * amount, sign)
+
+    # 寫入之後 O(1) 更新；寫入前後版本唔係啱啱 +1 (中間有同步) 就標記要重建
+    def record(self, action, sheet_name, before, after, data_dict, row_id):
+        if sheet_name not in ("activities", "monthly_fyc"): return
+        if self.versions.get(sheet_name) != before or after != before + 1:
+            self.versions.pop(sheet_name, None); return
+        is_act = sheet_name == "activities"
+        rows, add = (self.act_rows, self.add_act) if is_act else (self.fyc_rows, self.add_fyc)
+        key = str(data_dict['id']) if action == "INSERT" else str(row_id)
+        old = rows.pop(key, None)
+        if old: add(old, -1)
+        if action == "UPDATE" and not old:
+            self.versions.pop(sheet_name, None); return
+        if action != "DELETE":
+            fields = dict(zip(("username", "date", "points") if is_act else ("username", "month", "amount"), old or ("", "", 0)))
+            fields.update({k: v for k, v in data_dict.items() if k in fields})
+            rows[key] = act_row(fields) if is_act else fyc_row(fields)
+            add(rows[key], 1)
+        self.versions[sheet_name] = after
+
+    def snapshot(self):
+        rnd = lambda table: {p: {k: {u: [round(c[0], 6), c[1]] for u, c in us.items()} for k, us in keys.items()} for p, keys in table.items()}
+        return rnd(self.act), rnd(self.fyc)
+
+    def leaderboard(self, users, month=None):
+        base_columns = ['username', 'team', 'recruit', 'avatar', 'fyc', 'Total_Score']
+        members = users[users['role'] == 'Member'][['username', 'team', 'recruit', 'avatar']].copy()
+        if members.empty: return pd.DataFrame(columns=base_columns)
+        fyc = self.fyc["all"].get("all", {}) if month == "Yearly" else self.fyc["month"].get(str(month), {})
+        members['fyc'] = members['username'].map(lambda u: fyc.get(u, [0])[0]).astype(float)
+        members['Total_Score'] = members['username'].map(lambda u: self.act["all"].get("all", {}).get(u, [0])[0]).astype(int)
+        members['recruit'] = pd.to_numeric(members['recruit'], errors='coerce').fillna(0).astype(int)
+        return members[base_columns].reset_index(drop=True)
+
+    def quarter_fyc(self, users, quarter):
+        members = users[users['role'] == 'Member'][['username', 'avatar']].copy()
+        if members.empty or not self.fyc.get("all"): return pd.DataFrame(columns=['username', 'q1_total'])
+        q = self.fyc["quarter"].get(quarter, {})
+        members['q1_total'] = members['username'].map(lambda u: q.get(u, [0])[0]).astype(float)
+        return members.reset_index(drop=True)
+
+    # start / end 係星期一；end=None 即係由 start 嗰個禮拜起計到最新
+    def week_stats(self, users, start, end=None):
+        members = users[users['role'] == 'Member'][['username', 'avatar']].copy()
+        if members.empty: return pd.DataFrame(columns=['username', 'wk_score', 'wk_count'])
+        score, count = {}, {}
+        for wk, us in self.act["week"].items():
+            if wk < pd.Timestamp(start) or (end is not None and wk > pd.Timestamp(end)): continue
+            for u, c in us.items(): score[u] = score.get(u, 0) + c[0]; count[u] = count.get(u, 0) + c[1]
+        members['wk_score'] = members['username'].map(lambda u: score.get(u, 0)).astype(float)
+        members['wk_count'] = members['username'].map(lambda u: count.get(u, 0)).astype(float)
+        return members.reset_index(drop=True)
+
+# --- 冷資料封存：完結咗嘅年度由 live sheet 搬去每張 sheet 每年一個 Parquet，live sheet 只留今年 ---
+# 每個 Parquet 係原始行 (全部存字串，可以原樣還原) + footer metadata 入面每人各 period 嘅總數，一個檔一次 os.replace，唔會寫一半
+ARCHIVE_DIR = get_setting("archive_dir", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive"))
+ARCHIVE_AUTO = str(get_setting("archive_auto", "0")) == "1"  # 封存後 Parquet 係唯一副本，ARCHIVE_DIR 要係持久 disk 先好開自動封存
+ARCHIVE_ENABLED = ARCHIVE_AUTO or bool(get_setting("archive_dir", ""))  # 預設資料夾喺 repo 入面 (gitignore 咗)，冇明確設定就唔准刪 live sheet 嘅行
+ARCHIVE_PERIODS = {"activities": ACT_PERIODS, "monthly_fyc": FYC_PERIODS}
+ARCHIVE_VALUE = {"activities": "points", "monthly_fyc": "amount"}
+ARCHIVE_KEYS = {"date": pd.Timestamp, "week": pd.Timestamp, "month": lambda k: pd.Period(k, "M"), "quarter": lambda k: pd.Period(k, "Q")}  # activities 嘅 period key；monthly_fyc 本身係字串
+
+def archive_path(sheet_name, year): return os.path.join(ARCHIVE_DIR, f"{sheet_name}_{year}.parquet")
+
+def row_years(sheet_name, df):
+    if sheet_name == "activities": return df['date_dt'].dt.year
+    return pd.to_numeric(df['month_key'].where(df['month_key'].map(month_quarter).notna()).str[:4], errors='coerce')
+
+def write_partition(sheet_name, year, rows):
+    path = archive_path(sheet_name, year)
+    raw = rows[SCHEMAS[sheet_name]].astype(str)
+    if os.path.exists(path): raw = pd.concat([pq.read_table(path).to_pandas(), raw]).drop_duplicates(subset=['id'], keep='last')
+    totals = period_totals(rollup_frame(sheet_name, derive_columns(sheet_name, raw)), ARCHIVE_VALUE[sheet_name], ARCHIVE_PERIODS[sheet_name])
+    flat = [[period, str(key.date()) if isinstance(key, pd.Timestamp) else str(key), user, total, n] for period, keys in totals.items() for key, users in keys.items() for user, (total, n) in users.items()]
+    table = pa.Table.from_pandas(raw.reset_index(drop=True), preserve_index=False)
+    ids = pd.to_numeric(raw['id'], errors='coerce')
+    meta = {b"tim.totals": json.dumps(flat).encode(), b"tim.max_id": str(int(ids.max()) if ids.notna().any() else 0).encode()}
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **meta})
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    pq.write_table(table, path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+
+class Archive:
+    def __init__(self, files):
+        self.files = files  # {sheet: {year: path}}
+        self.years = {sn: set(years) for sn, years in files.items()}
+        self.totals, self.ids, self.max_ids = {sn: {} for sn in ARCHIVE_PERIODS}, {}, {sn: 0 for sn in ARCHIVE_PERIODS}
+        for sn, years in files.items():
+            for path in years.values():
+                # 總數同最大 id 都喺 footer，唔使讀原始行
+                meta = pq.read_schema(path).metadata
+                self.max_ids[sn] = max(self.max_ids[sn], int(meta.get(b"tim.max_id", 0)))
+                for period, key, user, total, n in json.loads(meta[b"tim.totals"]):
+                    key = ARCHIVE_KEYS[period](key) if sn == "activities" and period in ARCHIVE_KEYS else key
+                    bump_counter(self.totals[sn].setdefault(period, {}), key, user, total, n)
+
+    # 已封存年度嘅行仲喺 live sheet (封存完未刪得切)：id 已經喺 Parquet 就唔好再計
+    def live(self, sheet_name, df):
+        closed = row_years(sheet_name, df).isin(self.years.get(sheet_name, ()))
+        if not closed.any(): return df
+        if sheet_name not in self.ids:
+            self.ids[sheet_name] = set().union(*(pq.read_table(p, columns=['id']).column('id').to_pylist() for p in self.files[sheet_name].values()))
+        return df[~(closed & df['id'].astype(str).isin(self.ids[sheet_name]))]
+
+    def merge_into(self, act, fyc):
+        for sn, table in (("activities", act), ("monthly_fyc", fyc)):
+            for period, keys in self.totals[sn].items():
+                for key, users in keys.items():
+                    for user, (total, n) in users.items(): bump_counter(table.setdefault(period, {}), key, user, total, n)
+
+    def stats(self):
+        return [{"sheet": sn, "year": y, "rows": pq.read_metadata(p).num_rows, "kb": round(os.path.getsize(p) / 1024, 1)} for sn, years in self.files.items() for y, p in sorted(years.items())]
+
+def archive_signature():
+    try: return tuple(sorted((f, os.stat(os.path.join(ARCHIVE_DIR, f)).st_mtime_ns) for f in os.listdir(ARCHIVE_DIR) if f.endswith(".parquet")))
+    except FileNotFoundError: return ()
+
+@st.cache_resource(max_entries=2)
+def load_archive(signature):
+    get_metrics().cache_lookup("archive", miss=True)
+    files = {sn: {} for sn in ARCHIVE_PERIODS}
+    for name, _ in signature:
+        sheet_name, _, year = name[:-len(".parquet")].rpartition("_")
+        if sheet_name in files and year.isdigit(): files[sheet_name][int(year)] = os.path.join(ARCHIVE_DIR, name)
+    return Archive(files)
+
+def get_archive():
+    get_metrics().cache_lookup("archive")
+    return load_archive(archive_signature())
+
+# 新 id 要大過封存咗嘅 id：Archive.live 同 write_partition 都靠 id 分辨一行係咪已封存
+def archived_max_id(sheet_name): return get_archive().max_ids.get(sheet_name, 0) if sheet_name in ARCHIVE_PERIODS else 0
+
+def is_archived_year(sheet_name, year): return year in get_archive().years.get(sheet_name, ())
+
+@st.cache_resource
+def get_archive_lock(): return threading.Lock()
+
+# 今年之前嘅行：先寫 Parquet，再由 live sheet 刪；中途斷咗下次再行會自動補返 (同 id 會覆蓋，唔會重複計)
+@timed
+def archive_closed_periods(year=None):
+    year, moved = year or datetime.date.today().year, {}
+    if not ARCHIVE_ENABLED: return moved
+    lock = get_archive_lock()
+    if not lock.acquire(blocking=False): return moved
+    try:
+        for sheet_name in ARCHIVE_PERIODS:
+            df = read_data(sheet_name)
+            years = row_years(sheet_name, df)
+            closed = years < year
+            if not closed.any(): continue
+            for y, part in df[closed].groupby(years[closed].astype(int)): write_partition(sheet_name, y, part)
+            # 一次過刪；TeamStats / Inbox 見到版本跳咗會自己重建
+            with get_rollups().lock: get_backend().delete_many(sheet_name, df.loc[closed, 'id'].tolist())
+            moved[sheet_name] = int(closed.sum())
+    finally: lock.release()
+    return moved
+
+@st.cache_resource
+def get_rollups(): return TeamStats()
+
+@timed
+def get_team_stats():
+    backend, stats = get_backend(), get_rollups()
+    with stats.lock:
+        backend.prepare("monthly_fyc", "activities")
+        versions = {sn: backend.version(sn) for sn in ["monthly_fyc", "activities"]}
+        versions["archive"] = archive_signature()
+        if stats.versions != versions: stats.rebuild(read_data("monthly_fyc"), read_data("activities"), versions, get_archive())
+    return stats
+
+# 用全量重建核對 incremental counter，返回唔夾嘅 period
+def verify_rollups():
+    stats = get_team_stats(); fresh = TeamStats()
+    with stats.lock:
+        fresh.rebuild(read_data("monthly_fyc"), read_data("activities"), stats.versions, get_archive())
+        mine, theirs = stats.snapshot(), fresh.snapshot()
+    return [f"activities/{p}" for p in ACT_PERIODS if mine[0].get(p, {}) != theirs[0].get(p, {})] + [f"monthly_fyc/{p}" for p in FYC_PERIODS if mine[1].get(p, {}) != theirs[1].get(p, {})]
+
+@timed
+def get_data(month=None): return with_avatar_urls(get_team_stats().leaderboard(get_clean_users(), month))
+
+def get_q1_data(): return with_avatar_urls(get_team_stats().quarter_fyc(get_clean_users(), "2026Q1"), 128)
+
+@timed
+def get_weekly_data():
+    today = datetime.date.today()
+    start = today - datetime.timedelta(days=today.weekday())
+    return with_avatar_urls(get_team_stats().week_stats(get_clean_users(), start)), start, today
+
+# 每週結算：一次過計一段 ISO week 嘅 winner / 罰款 / 獎金；已完結嘅週寫入 weekly_ledger，之後只讀唔改
+WEEKLY_PENALTY = 100
+MIN_WEEKLY_ACTS = 3
+TEAM_BONUS = 100  # 全員達標冇罰款，Tim 自掏 $100
+
+def iso_week(d): y, w, _ = d.isocalendar(); return f"{y}-W{w:02d}"
+
+def week_monday(label): y, w = str(label).split("-W"); return datetime.date.fromisocalendar(int(y), int(w), 1)
+
+def is_settled_week(d): return iso_week(pd.Timestamp(d).date()) in set(read_data("weekly_ledger")['week'].astype(str))
+
+# 今週同上週用而家所有 Member (同 Challenge 頁一樣，零活動都要罰)；
+# 更早嘅歷史週名單由資料推返：嗰週或之前已經有活動嘅 member 先計 (遲入隊唔會罰返入隊前)，
+# 已離隊 (INACTIVE_MEMBERS) 嘅照計入歷史，但只計到佢最後有活動嗰週
+def compute_settlement(mondays):
+    cols = ['week', 'username', 'score', 'count', 'penalty', 'prize']
+    if not mondays: return pd.DataFrame(columns=cols)
+    stats, users = get_team_stats(), read_data("users").drop_duplicates(subset=['username'], keep='first')
+    candidates = set(users.loc[users['role'] == 'Member', 'username'].astype(str)) | set(INACTIVE_MEMBERS)
+    current = sorted(set(users.loc[users['role'] == 'Member', 'username'].astype(str)) - set(INACTIVE_MEMBERS))
+    recent = pd.Timestamp(datetime.date.today() - datetime.timedelta(days=datetime.date.today().weekday() + 7))
+    wanted = {pd.Timestamp(m): iso_week(m) for m in mondays}
+    with stats.lock:
+        span = {}
+        for wk, us in stats.act["week"].items():
+            for u in us: lo, hi = span.get(u, (wk, wk)); span[u] = (min(lo, wk), max(hi, wk))
+        counts = [(wanted[wk], u, c[0], c[1]) for wk, us in stats.act["week"].items() if wk in wanted for u, c in us.items()]
+    history = sorted(candidates & set(span))
+    roster = [(label, u) for wk, label in wanted.items() for u in (current if wk >= recent else [u for u in history if span[u][0] <= wk and (u not in INACTIVE_MEMBERS or wk <= span[u][1])])]
+    if not roster: return pd.DataFrame(columns=cols)
+    grid = pd.MultiIndex.from_tuples(roster, names=['week', 'username'])
+    df = pd.DataFrame(counts, columns=['week', 'username', 'score', 'count']).groupby(['week', 'username']).sum().reindex(grid, fill_value=0)
+    by_week = df.groupby(level='week')
+    top = by_week['score'].transform('max')
+    winner = (df['score'] == top) & (top > 0)
+    df['penalty'] = (df['count'] < MIN_WEEKLY_ACTS) * WEEKLY_PENALTY
+    pool = df.groupby(level='week')['penalty'].transform('sum')
+    df['prize'] = (pool.where(pool > 0, TEAM_BONUS) / winner.groupby(level='week').transform('sum').clip(lower=1)).where(winner, 0).round(2)
+    return df.reset_index()[cols]
+
+# start / end 係日子；已入 ledger 嘅週直接讀，其餘即場計；settle=True (明確結算) 先將完結咗嘅週寫入 ledger，預覽唔寫
+@timed
+def get_settlement(start, end=None, settle=False):
+    this_monday = datetime.date.today() - datetime.timedelta(days=datetime.date.today().weekday())
+    first = start - datetime.timedelta(days=start.weekday())
+    last = (end or start) - datetime.timedelta(days=(end or start).weekday())
+    mondays = [first + datetime.timedelta(weeks=i) for i in range((last - first).days // 7 + 1)]
+    with get_rollups().lock:
+        ledger = read_data("weekly_ledger").drop_duplicates(subset=['week', 'username'], keep='first')
+        settled = set(ledger['week'].astype(str))
+        fresh = compute_settlement([m for m in mondays if iso_week(m) not in settled])
+        if settle:
+            closed, now = fresh[fresh['week'].map(week_monday) < this_monday], str(datetime.datetime.now())
+            for r in closed.to_dict("records"): run_query_gs("INSERT", "weekly_ledger", {**r, 'settled_at': now})
+    weeks = {iso_week(m) for m in mondays}
+    old = ledger[ledger['week'].astype(str).isin(weeks)][fresh.columns]
+    df = pd.concat([old, fresh], ignore_index=True) if not old.empty else fresh
+    for c in ['score', 'count', 'penalty', 'prize']: df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
+    return df.sort_values(['week', 'score'], ascending=[True, False]).reset_index(drop=True)
+
+def settlement_report(week_df, start, end):
+    winners, losers = week_df[week_df['prize'] > 0], week_df[week_df['penalty'] > 0]
+    report = f"📅 *【TIM TEAM 上週戰報 ({start} ~ {end})】* 🦁\n\n"
+    if not winners.empty:
+        report += f"🏆 *上週 MVP (獨得獎金 ${int(winners['prize'].iloc[0])}):*\n"
+        report += "".join(f"👑 *{r.username}* ({int(r.score)}分)\n" for r in winners.itertuples())
+        report += f"_多謝 {len(losers)} 位同事贊助獎金池！_\n\n" if not losers.empty else "_全員達標！Tim 自掏 $100 請飲茶！_\n\n"
+    else: report += "⚠️ *上週全軍覆沒？* 無人開工？\n\n"
+    if not losers.empty:
+        report += f"💸 *【罰款名單 - 每人 ${WEEKLY_PENALTY}】*\n_活動量不足 {MIN_WEEKLY_ACTS} 次，請自覺 PayMe 俾 Winner！_\n"
+        report += "".join(f"❌ {r.username} (得 {int(r.count)} 次)\n" for r in losers.itertuples())
+    else: report += "✅ *上週無人罰款！Excellent！*\n"
+    report += "\n📊 *詳細戰況：*\n"
+    report += "".join(f"{r.username}: {int(r.score)}分 ({int(r.count)}次)\n" for r in week_df.itertuples())  # 逐行砌，空 frame 都唔會撞 dtype
+    return report + "\n🚀 *新一週由零開始，大家加油！*"
+
+# 武器庫全文搜尋：inverted index，中文逐字 + 兩字 n-gram，英文/數字按字詞 (支援前綴)
+STORY_FIELDS = {"title": 3.0, "category": 2.0, "knowledge": 1.5, "story_context": 1.5, "nightmare": 1.0, "dream": 1.0, "scenario": 1.0}
+TOKEN_RE = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+|[a-z0-9]+")
+
+def is_cjk(ch): return "\u3400" <= ch <= "\u9fff" or "\uf900" <= ch <= "\ufaff"
+
+def tokenize(text):
+    terms = []
+    for m in TOKEN_RE.findall(str(text).lower()):
+        if is_cjk(m[0]): terms += list(m) + [m[i:i + 2] for i in range(len(m) - 1)]
+        else: terms.append(m)
+    return terms
+
+class StoryIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.docs, self.postings, self.vocab, self.order = {}, {}, None, None  # vocab: 排好序嘅英文 term，前綴搜尋用；order: 新到舊嘅 id
+
+    def add(self, record):
+        key = str(record.get("id", ""))
+        if key in self.docs: return  # 同一個 id 只留第一條
+        self.docs[key] = record
+        for field, weight in STORY_FIELDS.items():
+            for t in tokenize(record.get(field, "")):
+                self.postings.setdefault(t, {})[key] = self.postings.get(t, {}).get(key, 0) + weight
+        self.vocab = self.order = None
+
+    def remove(self, key):
+        record = self.docs.pop(str(key), None)
+        if record is None: return
+        for t in {t for f in STORY_FIELDS for t in tokenize(record.get(f, ""))}:
+            docs = self.postings.get(t, {}); docs.pop(str(key), None)
+            if not docs: self.postings.pop(t, None)
+        self.vocab = self.order = None
+
+    def rebuild(self, df, version):
+        self.docs, self.postings, self.vocab, self.order = {}, {}, None, None
+        for r in df.to_dict("records"): self.add(r)
+        self.version = version
+
+    # 同 TeamStats.record 一樣：版本啱啱 +1 先 incremental，否則下次搜尋重建
+    def record(self, action, sheet_name, before, after, data_dict, row_id):
+        if sheet_name != "story_ammo": return
+        if self.version != before or after != before + 1: self.version = None; return
+        key = str(data_dict['id']) if action == "INSERT" else str(row_id)
+        old = self.docs.get(key); self.remove(key)
+        if action == "INSERT": self.add(dict(data_dict))
+        elif action == "UPDATE" and old: self.add({**old, **data_dict})
+        self.version = after
+
+    def matches(self, term):
+        if not term.isascii(): return self.postings.get(term, {})
+        if self.vocab is None: self.vocab = sorted(t for t in self.postings if t.isascii())
+        hits = {}
+        for t in self.vocab[bisect.bisect_left(self.vocab, term):]:
+            if not t.startswith(term): break
+            for k, w in self.postings[t].items(): hits[k] = max(hits.get(k, 0), w if t == term else w / 2)  # 完全吻合排先過前綴
+        return hits
+
+    # 每個 term 都要中 (AND)，分數 = 欄位權重 × idf；同分新嘅排先
+    def newest(self):
+        if self.order is None: self.order = sorted(self.docs, key=story_order, reverse=True)
+        return self.order
+
+    def search(self, query="", category=None):
+        keys = [k for k in self.newest() if not category or str(self.docs[k].get("category", "")) == category]
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms: return [self.docs[k] for k in keys]
+        scores = dict.fromkeys(keys, 0.0)
+        for t in terms:
+            hits = self.matches(t)
+            idf = math.log(1 + len(self.docs) / (1 + len(hits)))
+            scores = {k: s + hits[k] * idf for k, s in scores.items() if k in hits}
+            if not scores: return []
+        return [self.docs[k] for k in sorted(scores, key=lambda k: (scores[k], story_order(k)), reverse=True)]
+
+    def categories(self): return list(dict.fromkeys(str(self.docs[k].get("category", "")) for k in self.newest()))
+
+def story_order(key): return (0, int(key)) if str(key).isdigit() else (-1, 0)
+
+@st.cache_resource
+def get_story_index(): return StoryIndex()
+
+@timed
+def search_stories(query="", category=None):
+    backend, index = get_backend(), get_story_index()
+    with index.lock:
+        backend.prepare("story_ammo")
+        version = backend.version("story_ammo")
+        if index.version != version: index.rebuild(read_data("story_ammo"), version)
+        return index.search(query, category)
+
+# 已讀時間先記喺 process 入面，定時一批寫返 users sheet；撳「收到」唔使即刻寫 Sheet，亦唔會令其他 cache 失效
+READ_FLUSH_INTERVAL = 60
+
+class ReadMarks:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.marks, self.dirty = {}, set()
+
+    def get(self, username):
+        with self.lock: return self.marks.get(username)
+
+    def mark(self, username, value):
+        with self.lock: self.marks[username] = value; self.dirty.add(username)
+
+    def run(self):
+        while True:
+            time.sleep(READ_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            batch, self.dirty = {u: self.marks[u] for u in self.dirty}, set()
+        backend = get_backend()
+        for username, value in batch.items():
+            try: backend.update("users", username, {"last_read": value})
+            except Exception:
+                with self.lock: self.dirty.add(username)  # 下一輪再試
+
+@st.cache_resource
+def get_read_marks():
+    marks = ReadMarks()
+    threading.Thread(target=marks.run, name="tim-team-read-marks", daemon=True).start()
+    atexit.register(marks.flush)
+    return marks
+
+def update_last_read_time(username): get_read_marks().mark(username, str(datetime.datetime.now()))
+
+# 通知收件箱：全隊同每個人各自一條排好序嘅 (timestamp, id)；未讀數 = bisect(全隊) - bisect(自己) - bisect(停用成員)
+NOTIFY_PAGE_SIZE = 10
+NOTIFY_LIMIT = 50  # 彈窗最多列最新 50 條，離開太耐都唔會成個 dialog 爆晒
+
+def inbox_entry(r):
+    ts = pd.to_datetime(r.get('timestamp', ''), errors='coerce')
+    if pd.isna(ts): return None
+    return (ts, str(r.get('id', ''))), {'username': str(r.get('username', '')), 'type': r.get('type', ''), 'note': r.get('note', ''), 'act_time': ts.strftime('%m/%d %H:%M')}
+
+class Inbox:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.keys, self.by_user, self.items = [], {}, {}  # items: id -> ((ts, id), 顯示用資料)
+
+    def add(self, r):
+        entry = inbox_entry(r)
+        if entry is None: return
+        key, item = entry
+        self.items[key[1]] = entry
+        bisect.insort(self.keys, key); bisect.insort(self.by_user.setdefault(item['username'], []), key)
+
+    def remove(self, act_id):
+        entry = self.items.pop(str(act_id), None)
+        if entry is None: return
+        key, item = entry
+        for keys in (self.keys, self.by_user.get(item['username'], [])):
+            i = bisect.bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key: keys.pop(i)
+
+    def rebuild(self, act_df, version):
+        ts = act_df['timestamp_dt']
+        self.keys, self.by_user, self.items = [], {}, {}
+        for (act_id, user, act_type, note), t in zip(act_df[['id', 'username', 'type', 'note']].itertuples(index=False), ts):
+            if pd.isna(t): continue
+            key = (t, str(act_id))
+            self.items[key[1]] = (key, {'username': str(user), 'type': act_type, 'note': note, 'act_time': t.strftime('%m/%d %H:%M')})
+            self.keys.append(key); self.by_user.setdefault(str(user), []).append(key)
+        self.keys.sort()
+        for keys in self.by_user.values(): keys.sort()
+        self.version = version
+
+    def record(self, action, sheet_name, before, after, data_dict, row_id):
+        if sheet_name != "activities": return
+        if self.version != before or after != before + 1: self.version = None; return
+        key = str(data_dict['id']) if action == "INSERT" else str(row_id)
+        old = self.items.get(key); self.remove(key)
+        if action == "INSERT": self.add(data_dict)
+        elif action == "UPDATE" and old: self.add({**old[1], 'id': key, 'timestamp': str(old[0][0]), **data_dict})
+        self.version = after
+
+    # 只計 last_read 之後、唔係自己、唔係停用成員嘅動態
+    def unread(self, user, last_read):
+        mark = (last_read, chr(0x10FFFF))
+        after = lambda keys: len(keys) - bisect.bisect_right(keys, mark)
+        return after(self.keys) - sum(after(self.by_user.get(u, [])) for u in {user, *INACTIVE_MEMBERS})
+
+    # 由新到舊攞第 page 頁
+    def page(self, user, last_read, page, size=NOTIFY_PAGE_SIZE):
+        skip, out = page * size, []
+        for key in reversed(self.keys):
+            if key[0] <= last_read or len(out) >= size: break
+            item = self.items[key[1]][1]
+            if item['username'] == user or item['username'] in INACTIVE_MEMBERS: continue
+            if skip: skip -= 1
+            else: out.append(item)
+        return out
+
+@st.cache_resource
+def get_inbox(): return Inbox()
+
+def get_inbox_ready():
+    backend, inbox = get_backend(), get_inbox()
+    with inbox.lock:
+        backend.prepare("activities")
+        version = backend.version("activities")
+        if inbox.version != version: inbox.rebuild(read_data("activities"), version)
+    return inbox
+
+def parse_last_read(value):
+    try: return pd.to_datetime(value) if value and str(value) != "" else pd.to_datetime("2020-01-01")
+    except Exception: return pd.to_datetime("2020-01-01")
+
+@st.dialog("🔥 團隊最新戰報 🔥")
+def show_notification_modal(current_user, last_read, total):
+    st.markdown(f"**Hi {current_user}，你不在的時候，團隊發生了 {total} 條動態：**")
+    shown = min(total, NOTIFY_LIMIT)
+    pages = max(1, -(-shown // NOTIFY_PAGE_SIZE))
+    page = min(st.session_state.get('inbox_page', 0), pages - 1)
+    inbox = get_inbox()
+    with inbox.lock: items = inbox.page(current_user, last_read, page)
+    for row in items:
+        st.info(f"**👤 {row['username']}** - {row['type']}\n\n📄 {row['note']}\n\n🕒 *{row['act_time']}*")
+    if pages > 1:
+        c_prev, c_page, c_next = st.columns([1, 2, 1])
+        if c_prev.button("⬅️", disabled=page == 0, use_container_width=True): st.session_state['inbox_page'] = page - 1; st.rerun(scope="fragment")
+        c_page.caption(f"第 {page + 1} / {pages} 頁" + (f"（只列最新 {NOTIFY_LIMIT} 條）" if total > NOTIFY_LIMIT else ""))
+        if c_next.button("➡️", disabled=page >= pages - 1, use_container_width=True): st.session_state['inbox_page'] = page + 1; st.rerun(scope="fragment")
+    st.markdown("---")
+    if st.button("收到 / OK (我知道了)", type="primary", use_container_width=True):
+        st.session_state['inbox_page'] = 0
+        update_last_read_time(current_user); st.rerun()
+
+# 返回 (last_read, 未讀數)；唔郁 UI，方便 bench.py 直接量度
+@timed
+def unread_notifications(current_user):
+    users_df = get_clean_users()
+    if users_df.empty: return None, 0
+    user_record = users_df[users_df['username'] == current_user]
+    if user_record.empty: return None, 0
+    last_read = max(parse_last_read(str(user_record.iloc[0]['last_read'])), parse_last_read(get_read_marks().get(current_user)))
+    inbox = get_inbox_ready()
+    with inbox.lock: return last_read, inbox.unread(current_user, last_read)
+
+def check_notifications(current_user):
+    last_read, total = unread_notifications(current_user)
+    if total > 0: show_notification_modal(current_user, last_read, total)
+
+TEMPLATE_SALES = "【客戶資料】\nName: \n講左3Q? 有咩feedback? \nFact Find 重點: \n\n【面談內容】\nSell左咩Plan? \n客戶反應/抗拒點: \n\n【下一步】\n下次見面日期: \nAction Items: "
+TEMPLATE_RECRUIT = "【準增員資料】\nName: \n背景/現職: \n對現狀不滿 (Pain Points): \n對行業最大顧慮: \n\n【面談內容】\nSell 左咩 Vision?: \n有無邀請去Team Dinner / Recruitment Talk? \n\n【下一步】\n下次跟進日期: \nAction Items: "
+TEMPLATE_NEWBIE = "【新人跟進】\n新人 Name: \n今日進度 (考牌/Training/出Code): \n遇到咩困難?: \nLeader 俾左咩建議?: \n\n【下一步】\nTarget: \n下次 Review 日期: "
+FEED_PAGE_SIZE = int(get_setting("feed_page_size", 20))
+STORY_PAGE_SIZE = int(get_setting("story_page_size", 20))
+ACTIVITY_TYPES = ["見面 (1分)", "傾保險 (2分)", "傾招募 (2分)", "新人報考試 (3分)", "簽單 (5分)", "新人出code (8分)"]
+
+def get_activity_style(act_type):
+    if "簽單" in act_type: return "card-signed", "badge-signed"
+    if "見面" in act_type or "傾" in act_type: return "card-meeting", "badge-meeting"
+    if "招募" in act_type or "新人" in act_type: return "card-recruit", "badge-recruit"
+    return "card-admin", "badge-default"
+
+init_db(SCHEMA_VERSION)  # 所有函數定義好先開 bootstrap thread
+migrate_avatars()
+
+# --- 5. UI 渲染 ---
+if 'logged_in' not in st.session_state: st.session_state['logged_in'] = False
+
+if not st.session_state['logged_in']:
+    c1, c2, c3 = st.columns([1,1.5,1])
+    with c2:
+        st.markdown("<br><br>", unsafe_allow_html=True)
+        with st.container():
+            st.markdown("<div style='text-align: center;'><h1>🦁 TIM TEAM 2026</h1></div>", unsafe_allow_html=True)
+            st.markdown("""<div style='background-color: #ffffff; padding: 20px; border-radius: 10px; border: 1px solid #C5A028; text-align: center; margin-bottom: 20px; box-shadow: 0 4px 10px rgba(0,0,0,0.05);'><h2 style='color: #C5A028 !important; margin:0;'>M + 2</h2><h3 style='color: #4A4A4A !important; margin:5px 0 15px 0;'>= 百萬年薪之路 💰</h3><div style='margin-top: 15px; padding-top: 10px; border-top: 1px dashed #ddd;'><span style='color: #666; font-size: 0.9em;'>2027 MDRT Requirement:</span><br><strong style='color: #D4AF37; font-size: 1.3em;'>HK$ 512,800</strong></div></div>""", unsafe_allow_html=True)
+            u = st.text_input("Username", placeholder="e.g., Tim")
+            p = st.text_input("Password", type="password", placeholder="••••••")
+            if st.button("🚀 LOGIN", use_container_width=True):
+                d = login(u, p)
+                if d:
+                    st.session_state.update({'logged_in':True, 'user':d[0][0], 'role':d[0][2], 'avatar':d[0][5]})
+                    st.toast(f"Welcome back, {d[0][0]}!", icon="🦁"); st.rerun()
+                else: st.toast("Login Failed", icon="❌")
+else:
+    read_many("users", "activities", "monthly_fyc")  # 首屏用到嘅 sheet 一次過預熱，冷 cache 都只係一個 round trip
+    check_notifications(st.session_state['user'])
+    with st.sidebar:
+        st.markdown("<br>", unsafe_allow_html=True)
+        c_avt, c_txt = st.columns([1, 2])
+        with c_avt: st.image(avatar_url(st.session_state.get('avatar',''), st.session_state['user'], 128), width=80)
+        with c_txt: 
+            st.markdown(f"<h3 style='margin:0; color:#C5A028 !important;'>{st.session_state['user']}</h3>", unsafe_allow_html=True)
+            st.caption(f"{st.session_state['role']} | TIM TEAM")
+        st.divider()
+        pages = ["📊 Dashboard 團隊報表", "📝 Check-in 打卡", "📚 Story Depot 彈藥庫", "⚖️ Challenge 獎罰", "🏆 Year Goal 年度挑戰", "🤝 Recruit 招募龍虎榜", "📅 Monthly 業績表", "👤 Profile 設定"]
+        if st.session_state['role'] == 'Leader': pages.append("🩺 Diagnostics 系統診斷")
+        menu = st.radio("MAIN MENU", pages, label_visibility="collapsed")
+        st.markdown("<br>"*3, unsafe_allow_html=True)
+        if st.button("🔒 Logout", use_container_width=True, type="secondary"): st.session_state['logged_in'] = False; st.rerun()
+
+    if "Dashboard" in menu:
+        st.markdown(f"## 📊 {st.session_state['user']}, Let's Go MDRT!")
+        if st.session_state['role'] == 'Leader':
+            with st.container(border=True):
+                st.markdown("### 📢 每週戰報生成器 (Admin Only)")
+                last_monday = datetime.date.today() - datetime.timedelta(days=datetime.date.today().weekday() + 7)
+                c_wk, c_btn = st.columns([1, 1])
+                with c_wk: wk_start = st.date_input("結算週", value=last_monday, max_value=last_monday, label_visibility="collapsed")
+                with c_btn: make_report = st.button("📝 生成上週結算戰報", use_container_width=True)
+                if make_report:
+                    start = wk_start - datetime.timedelta(days=wk_start.weekday()); end = start + datetime.timedelta(days=6)
+                    wk_df = get_settlement(start)
+                    report = settlement_report(wk_df, start, end)
+                    st.code(report)
+                    st.link_button("📤 Send to WhatsApp", f"https://wa.me/?text={urllib.parse.quote(report)}")
+                if st.button("📚 補結算所有過往週 (寫入 Ledger)"):
+                    weeks = get_team_stats().act["week"]
+                    if weeks:
+                        ledger = get_settlement(min(weeks).date(), last_monday, settle=True)
+                        summary = ledger.assign(winner=ledger['username'].where(ledger['prize'] > 0)).groupby('week').agg(pool=('penalty', 'sum'), winners=('winner', lambda s: ", ".join(s.dropna())), prize=('prize', 'max'))
+                        st.success(f"已結算 {len(summary)} 週"); st.dataframe(summary.sort_index(ascending=False), use_container_width=True)
+
+        df = get_data("Yearly")
+        c1, c2, c3 = st.columns(3)
+        c1.metric("💰 Team FYC", f"${df['fyc'].sum():,.0f}"); c2.metric("👥 Recruits", int(df['recruit'].sum())); c3.metric("🔥 Activities", int(df['Total_Score'].sum()))
+        st.markdown("### 🏆 Leaderboard")
+        mdrt_target = 512800
+        df['mdrt_fraction'] = df['fyc'].apply(lambda x: f"${x:,.0f} / ${mdrt_target:,.0f}")
+        df['mdrt_percent'] = (df['fyc'] / mdrt_target) * 100
+        df_sorted = df.sort_values(by='fyc', ascending=False)
+        st.dataframe(df_sorted[['avatar', 'username', 'mdrt_fraction', 'mdrt_percent', 'recruit', 'Total_Score']],
+            column_config={
+                "avatar": st.column_config.ImageColumn("Avatar", width="small"),
+                "username": st.column_config.TextColumn("Name"),
+                "mdrt_fraction": st.column_config.TextColumn("MDRT 進度 (實數)"),
+                "mdrt_percent": st.column_config.ProgressColumn("MDRT %", format="%.1f%%", min_value=0, max_value=100),
+                "recruit": st.column_config.NumberColumn("Recruit", format="%d"),
+                "Total_Score": st.column_config.NumberColumn("Activity", format="%d")
+            }, use_container_width=True, hide_index=True)
+
+        if st.session_state['role'] == 'Leader':
+            with st.expander("⚙️ 業績/招募管理 (Admin Only)"):
+                c_a, c_b, c_c = st.columns(3)
+                user_list = df['username'].unique().tolist()
+                tgt = c_a.selectbox("User", user_list); mth = c_b.selectbox("Month", [f"2026-{i:02d}" for i in range(1,13)]); amt = c_c.number_input("Amount", step=1000)
+                if st.button("Save FYC"):
+                    if upd_fyc(tgt, mth, amt): st.toast("Saved!", icon="✅"); st.rerun()
+                    else: st.error(f"{mth[:4]} 年度已封存，唔可以再改")
+                st.divider()
+                c_d, c_e = st.columns(2)
+                tgt_r = c_d.selectbox("User", user_list, key="r1"); rec = c_e.number_input("Recruits", step=1)
+                if st.button("Save Recruit"): upd_rec(tgt_r, rec); st.toast("Saved!", icon="✅"); st.rerun()
+                st.divider()
+                if st.button("🧮 核對排行榜統計 (全量重建比對)"):
+                    diff = verify_rollups()
+                    if diff: get_rollups().versions = {}; st.warning(f"統計唔夾，已重建：{', '.join(diff)}")
+                    else: st.success("統計同全量重建一致 ✅")
+
+    elif "Story Depot" in menu:
+        st.markdown("## 📚 逢星期四 Drill Training 素材庫")
+        st.caption("「將客觀數據轉化為真實故事，極端對比出無保障嘅噩夢 vs 有保障嘅美夢」")
+        
+        active_pool_df = get_clean_users()
+        roster_pool = active_pool_df[~active_pool_df['username'].isin(['Admin', 'Tim'])]['username'].dropna().unique().tolist()
+        roster_pool.sort() 
+        
+        if not roster_pool: roster_pool = [u for u in active_pool_df['username'].unique() if u != 'Admin']
+        if not roster_pool: roster_pool = ['本週負責同事']
+        
+        curr_week_num = datetime.date.today().isocalendar()[1]
+        this_week_duty = roster_pool[curr_week_num % len(roster_pool)]
+        
+        st.markdown(f"""
+        <div class="challenge-header-box" style="border-left-color: #9b59b6; background: linear-gradient(to right, #f4ecf7, #ffffff);">
+            <div style="font-size: 1.1em; font-weight: 800; color: #9b59b6; margin-bottom: 5px;">📢 本週 Drill Training (Week {curr_week_num}) 任務分配</div>
+            <div style="font-size: 1.1em; color: #333;">
+                🎯 輪值主講同事： <strong style="color: #9b59b6; font-size:1.25em;">【 {this_week_duty} 】</strong><br>
+                👑 固定主講底子： <strong style="color: #D4AF37; font-size:1.25em;">【 Tim 】</strong>
+            </div>
+            <p style="margin: 8px 0 0 0; font-size: 0.9em; color: #666;">
+                玩法：提交「專業知識點」同「真實故事背景」。Training 時全隊一齊腦力激盪，畫出客戶不作為嘅「噩夢畫面」同擁有方案嘅「美夢畫面」！
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        tab_submit, tab_library = st.tabs(["📥 1. 提交知識素材 (Drill 前)", "📖 2. 團隊武器庫 (天堂與地獄對照)"])
+        
+        with tab_submit:
+            with st.form("ammo_form", clear_on_submit=True):
+                st.markdown("### ✍️ 準備 Heaven & Hell 銷售素材")
+                c_cat, c_date = st.columns(2)
+                with c_cat:
+                    cat = st.selectbox("📌 知識點範疇", [
+                        "行為金融學 (理智漏洞)", 
+                        "醫療理賠 (危機感)", 
+                        "財富傳承 (家族案例)", 
+                        "資產配置 (觀念導正)", 
+                        "市場熱話 / 政策解讀"
+                    ])
+                with c_date:
+                    d = st.date_input("📅 提交日期", value=datetime.date.today())
+                
+                title = st.text_input("🏷️ 知識點主題 (Hook)", placeholder="e.g., 隱形醫療通脹")
+                knowledge = st.text_area("📚 專業知識點 (客觀事實)", height=80, placeholder="e.g., 過去十年香港醫療通脹率平均每年8-10%...")
+                story_context = st.text_area("🗣️ 真實故事背景 (引起共鳴)", height=80, placeholder="e.g., 一位IT中層，突然確診，公司保險3個月就打爆咗...")
+                
+                st.markdown("---")
+                st.markdown("*(以下欄位可於 Training 討論後再完整補上)*")
+                c_night, c_dream = st.columns(2)
+                with c_night:
+                    nightmare = st.text_area("💔 噩夢畫面 (無保障嘅慘況)", height=150, placeholder="e.g., 太太喊到崩潰，要賣樓賣車籌醫藥費...")
+                with c_dream:
+                    dream = st.text_area("✨ 美夢畫面 (擁有保障嘅安心)", height=150, placeholder="e.g., 唯一任務就係專心養病，唔使愁下個月供樓啲錢...")
+                
+                scenario = st.text_input("🎯 實戰場景 (幾時對客講？)", placeholder="e.g., 當客戶嫌醫療保險貴，覺得有公司醫保就夠嗰陣")
+                
+                if st.form_submit_button("🚀 儲存知識素材"):
+                    if title and knowledge and story_context:
+                        add_ammo(st.session_state['user'], d, cat, title, knowledge, story_context, nightmare, dream, scenario)
+                        st.toast("知識點提交成功！", icon="💥")
+                    else:
+                        st.error("「標題」、「知識點」同「真實故事」係必填架！噩夢/美夢可以留空。")
+
+        with tab_library:
+            all_ammo = search_stories()
+            if all_ammo and 'knowledge' in all_ammo[0]:
+                col_s, col_f = st.columns([2, 1])
+                with col_s: search_kw = st.text_input("🔍 關鍵字搜尋", placeholder="搜尋標題、故事、噩夢/美夢、應用場景...")
+                with col_f: filter_cat = st.selectbox("📂 分類篩選", ["全部"] + get_story_index().categories())
+                
+                results = search_stories(search_kw, None if filter_cat == "全部" else filter_cat)
+                
+                # 換關鍵字 / 分類就返去第一頁
+                if st.session_state.get('ammo_query') != (search_kw, filter_cat):
+                    st.session_state['ammo_query'] = (search_kw, filter_cat); st.session_state['ammo_page'] = 0
+                pages = max(1, -(-len(results) // STORY_PAGE_SIZE))
+                page = min(st.session_state.get('ammo_page', 0), pages - 1)
+                
+                st.markdown(f"**武器庫總存量： {len(results)} 個 Script**")
+                
+                # 只畫標題；打開咗嘅 expander 先載入內容
+                for row in results[page * STORY_PAGE_SIZE:(page + 1) * STORY_PAGE_SIZE]:
+                    exp = st.expander(f"[{row['category']}] {row['title']}  (✍️ 提交人: {row['username']})", key=f"ammo_{row['id']}", on_change="rerun")
+                    if not exp.open: continue
+                    with exp:
+                        
+                        st.markdown(f"**📚 專業知識點：**\n{row['knowledge']}")
+                        st.markdown(f"**🗣️ 真實故事背景：**\n{row['story_context']}")
+                        st.markdown("<br>", unsafe_allow_html=True)
+                        
+                        c_night, c_dream = st.columns(2)
+                        with c_night:
+                            if row['nightmare']:
+                                st.markdown(f"<div class='ammo-nightmare'><strong>💔 噩夢畫面 (無買/買錯的代價)：</strong><br><br>{row['nightmare']}</div>", unsafe_allow_html=True)
+                            else:
+                                st.warning("⏳ 噩夢畫面等待 Training 討論...")
+                        with c_dream:
+                            if row['dream']:
+                                st.markdown(f"<div class='ammo-dream'><strong>✨ 美夢畫面 (擁有方案的結果)：</strong><br><br>{row['dream']}</div>", unsafe_allow_html=True)
+                            else:
+                                st.warning("⏳ 美夢畫面等待 Training 討論...")
+                                
+                        st.caption(f"🎯 應用場景：{row['scenario']}  •  📅 記錄日期：{row['date']}")
+                
+                if pages > 1:
+                    c_prev, c_page, c_next = st.columns([1, 2, 1])
+                    if c_prev.button("⬅️ 上一頁", disabled=page == 0, use_container_width=True):
+                        st.session_state['ammo_page'] = page - 1; st.rerun()
+                    c_page.caption(f"第 {page + 1} / {pages} 頁")
+                    if c_next.button("下一頁 ➡️", disabled=page >= pages - 1, use_container_width=True):
+                        st.session_state['ammo_page'] = page + 1; st.rerun()
+            else:
+                st.info("武器庫仲係吉架，快啲提交第一批素材！(請確保已刪除 Google Sheet 舊有嘅 story_ammo)")
+
+    elif "Check-in" in menu:
+        st.markdown("## 📝 Activity Center")
+        tab_new, tab_hist = st.tabs(["✍️ 立即打卡 (Check-in)", "👀 團隊動態 (Team Feed)"])
+        
+        with tab_new:
+            with st.form("checkin_form", clear_on_submit=True):
+                with st.container(border=True):
+                    c_date, c_type = st.columns([1, 1])
+                    with c_date: d = st.date_input("📅 日期", value=datetime.date.today())
+                    with c_type: t = st.selectbox("📌 活動種類", ACTIVITY_TYPES)
+                    note_val = TEMPLATE_RECRUIT if "招募" in t else TEMPLATE_NEWBIE if "新人" in t else TEMPLATE_SALES
+                    n = st.text_area("📝 內容詳情 / 備註", value=note_val, height=180, help="請詳細記錄客戶反應或下一步行動")
+                    st.markdown("<br>", unsafe_allow_html=True)
+                    submitted = st.form_submit_button("🚀 提交打卡 (Submit)", type="primary")
+                    if submitted: 
+                        if add_act(st.session_state['user'], d, t, n): st.toast("提交成功！", icon="✅")
+                        else: st.error(f"{d.year} 年度已封存，唔可以再打卡" if is_archived_year("activities", d.year) else f"{iso_week(d)} 已結算，唔可以再打卡")
+
+        with tab_hist:
+            st.markdown("### 📜 Timeline")
+            users_df = get_clean_users()
+            user_options = users_df['username'].unique() if not users_df.empty else []
+            filter_user = st.multiselect("🔍 篩選同事 (Filter)", options=user_options)
+            
+            if st.session_state.get('feed_filter') != filter_user:
+                st.session_state['feed_filter'] = filter_user; st.session_state['feed_limit'] = FEED_PAGE_SIZE
+            limit = st.session_state.get('feed_limit', FEED_PAGE_SIZE)
+            page, total = get_feed_page(users_df, filter_user, limit)
+            if not page.empty:
+                for row in page.itertuples():
+                    card_class, badge_class = get_activity_style(row.type)
+                    
+                    st.markdown(f"""
+                    <div class="activity-card {card_class}">
+                        <div class="act-header">
+                            <div class="act-user-info">
+                                <img src="{row.avatar_url}" class="act-avatar">
+                                <div><div class="act-name">{row.username}</div><div class="act-time">{row.act_date} {row.act_time}</div></div>
+                            </div>
+                            <div class="act-badge {badge_class}">{row.type}</div>
+                        </div>
+                        <div class="act-content">{row.note}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                st.caption(f"顯示 {len(page)} / {total} 條動態")
+                if total > limit and st.button("⬇️ 載入更多", use_container_width=True):
+                    st.session_state['feed_limit'] = limit + FEED_PAGE_SIZE; st.rerun()
+            else:
+                st.info("暫無動態，快啲去 Check-in！")
+
+    elif "Challenge" in menu:
+        df, start, end = get_weekly_data()
+        st.markdown(f"## ⚖️ Winner Takes All ({start} ~ {end})")
+        st.markdown("""<div class="challenge-header-box"><div class="challenge-title">📜 詳細遊戲規則 (Game Rules)：</div><ul class="challenge-rules"><li><strong>結算時間：</strong> 逢星期日晚 23:59 系統自動結算。</li><li><strong>罰款準則：</strong> 每週活動量 (Count) <strong>少於 3 次</strong> 者，需罰款 <strong>$100</strong>。</li><li><strong>獎金歸屬：</strong> 所有罰款注入獎金池，由 <strong>最高分 (Score)</strong> 者獨得。</li></ul></div>""", unsafe_allow_html=True)
+        if not df.empty:
+            max_score = df['wk_score'].max(); winners = df[df['wk_score'] == max_score] if max_score > 0 else pd.DataFrame()
+            pool = len(df[df['wk_count'] < 3]) * 100
+            st.markdown(f"### 🏆 Prize Pool: <span style='color:#C5A028'>${pool if pool > 0 else 100}</span>", unsafe_allow_html=True)
+            if not winners.empty:
+                cols = st.columns(len(winners)); 
+                for idx, row in winners.reset_index().iterrows(): cols[idx].image(row['avatar'], width=60); cols[idx].caption(f"👑 {row['username']}")
+            st.dataframe(df[['avatar', 'username', 'wk_score', 'wk_count']].sort_values(by='wk_score', ascending=False),
+                         column_config={"avatar": st.column_config.ImageColumn("", width="small"), "wk_score": st.column_config.ProgressColumn("Score", format="%d", max_value=max(10, max_score))}, use_container_width=True, hide_index=True)
+
+    elif "Year Goal" in menu:
+        st.markdown("## 🏆 2026 年度挑戰")
+        q1_df = get_q1_data(); q1_target = 88000
+        st.markdown("""<div class="challenge-header-box"><div class="challenge-title">🔥 Q1 88000 Challenge (1/1 - 31/3)</div><p class="challenge-rules"><strong>目標：</strong> 第一季 (Q1) 累積 FYC 達 <strong>HK$ 88,000</strong>。<br>這是通往 MDRT 的第一張入場券，必須拿下！</p></div>""", unsafe_allow_html=True)
+        if not q1_df.empty:
+            for i, r in q1_df.sort_values(by='q1_total', ascending=False).iterrows():
+                progress = min(r['q1_total'] / q1_target, 1.0)
+                st.markdown(f"""<div class="q1-player-card"><div class="q1-avatar-box"><img src="{r['avatar']}"></div><div class="q1-info-box"><div class="q1-name">{r['username']}</div><div class="q1-amount">${r['q1_total']:,.0f}</div><div class="q1-progress-container"><div class="q1-progress-bar" style="width: {progress*100}%;"></div></div><div class="q1-target-label">Target: $88,000 ({progress*100:.1f}%)</div></div></div>""", unsafe_allow_html=True)
+        else: st.info("暫無 Q1 業績數據，加油！")
+        st.divider(); st.markdown("### 🎁 年度獎賞計劃")
+        c1, c2 = st.columns(2)
+        with c1: st.markdown('<div class="reward-card-premium"><span class="reward-icon">🚀</span><p class="reward-title-p">1st MDRT</p><p class="reward-prize-p">$20,000 Cash</p><p class="reward-desc-p">首位完成 $512,800 FYC 者獨得</p></div>', unsafe_allow_html=True)
+        with c2: st.markdown('<div class="reward-card-premium"><span class="reward-icon">👑</span><p class="reward-title-p">Top FYC 冠軍</p><p class="reward-prize-p">$10,000 Cash</p><p class="reward-desc-p">全年業績最高者 (需 Min. 180,000 FYC)</p></div>', unsafe_allow_html=True)
+        st.write(""); c3, c4 = st.columns(2)
+        with c3: st.markdown('<div class="reward-card-premium"><span class="reward-icon">✈️</span><p class="reward-title-p">招募冠軍</p><p class="reward-prize-p">雙人來回機票</p><p class="reward-desc-p">全年招募人數最多者 (需 Min. 2人)</p></div>', unsafe_allow_html=True)
+        with c4: st.markdown('<div class="reward-card-premium"><span class="reward-icon">🍽️</span><p class="reward-title-p">Monthly Star</p><p class="reward-prize-p">Tim 請食飯</p><p class="reward-desc-p">單月 FYC 最高者 (需 Min. $20k)</p></div>', unsafe_allow_html=True)
+
+    elif "Recruit" in menu:
+        st.markdown("## 🤝 Recruit 龍虎榜")
+        df = get_data("Yearly")
+        if not df.empty:
+            st.dataframe(
+                df[['avatar', 'username', 'recruit']].sort_values(by='recruit', ascending=False),
+                column_config={
+                    "avatar": st.column_config.ImageColumn("Avatar", width="small"),
+                    "username": st.column_config.TextColumn("Agent"),
+                    "recruit": st.column_config.ProgressColumn("Recruits (Headcount)", format="%d", min_value=0, max_value=10)
+                }, use_container_width=True, hide_index=True
+            )
+        else: st.info("暫無招募數據，大家加油！")
+
+    elif "Monthly" in menu:
+        st.markdown("## 📅 Monthly FYC 龍虎榜")
+        m = st.selectbox("Month", [f"2026-{i:02d}" for i in range(1,13)])
+        df = get_data(month=m)
+        if not df.empty:
+            max_fyc = df['fyc'].max() if df['fyc'].max() > 0 else 50000
+            st.dataframe(
+                df[['avatar', 'username', 'fyc']].sort_values(by='fyc', ascending=False),
+                column_config={
+                    "avatar": st.column_config.ImageColumn("Avatar", width="small"),
+                    "username": st.column_config.TextColumn("Agent"),
+                    "fyc": st.column_config.ProgressColumn("FYC Achievement", format="$%d", min_value=0, max_value=max_fyc)
+                }, use_container_width=True, hide_index=True
+            )
+        else: st.info("本月暫無數據")
+
+    elif "Profile" in menu:
+        st.markdown("## 👤 User Profile")
+        col1, col2 = st.columns([1, 2])
+        with col1: st.image(avatar_url(st.session_state.get('avatar'), st.session_state['user'], 256), width=150)
+        with col2:
+            st.markdown(f"### {st.session_state['user']}"); st.markdown(f"**Role:** {st.session_state['role']}")
+            with st.expander("🔐 Change Password"):
+                new_pw = st.text_input("New Password", type="password")
+                if st.button("Update Password"): update_pw(st.session_state['user'], new_pw); st.toast("Password Updated!", icon="✅")
+            with st.expander("🖼️ Change Avatar"):
+                uploaded_file = st.file_uploader("Upload Image", type=['jpg', 'png', 'jpeg'])
+                if uploaded_file is not None and 'avatar_job' not in st.session_state:
+                    if st.button("Upload"): st.session_state['avatar_job'] = proc_img(uploaded_file)
+                if 'avatar_job' in st.session_state: avatar_upload_status()
+
+    elif "Diagnostics" in menu and st.session_state['role'] == 'Leader':
+        st.markdown("## 🩺 系統診斷 (Leader Only)")
+        snap = get_metrics().snapshot(); wq = get_write_queue()
+        st.caption(f"統計由 {snap['started']} 開始 (每個 process 獨立)")
+        reruns = pd.DataFrame(snap['reruns'], columns=['at', 'page', 'ms'])
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("📡 Sheets API calls", sum(a['calls'] for a in snap['api'])); c2.metric("❌ API errors", sum(a['errors'] for a in snap['api']))
+        c3.metric("⏱️ Rerun p95", f"{reruns['ms'].quantile(0.95):.0f} ms" if not reruns.empty else "-"); c4.metric("📝 待寫入", len(wq.ops))
+        st.markdown("### 📡 Sheets API (按 sheet / 動作)")
+        st.dataframe(pd.DataFrame(snap['api'], columns=['sheet', 'verb', 'calls', 'errors', 'total_ms', 'max_ms']).sort_values('calls', ascending=False), use_container_width=True, hide_index=True)
+        st.markdown("### ⏱️ 每頁 Rerun 耗時")
+        if not reruns.empty: st.dataframe(reruns.groupby('page')['ms'].describe(percentiles=[0.5, 0.95])[['count', '50%', '95%', 'max']], use_container_width=True)
+        st.markdown("### 🧮 函數耗時")
+        st.dataframe(pd.DataFrame(snap['functions'], columns=['name', 'calls', 'total_ms', 'avg_ms', 'max_ms']).sort_values('total_ms', ascending=False), use_container_width=True, hide_index=True)
+        st.markdown("### 💾 Cache 命中率")
+        pool_stats = get_sheet_pool().stats()
+        cache = snap['cache'] + [{"name": "sheet_pool", "calls": pool_stats['hits'] + pool_stats['misses'], "misses": pool_stats['misses'], "hit_ratio": round(pool_stats['hit_ratio'], 3)}]
+        st.dataframe(pd.DataFrame(cache, columns=['name', 'calls', 'misses', 'hit_ratio']), use_container_width=True, hide_index=True)
+        st.markdown("### 🗄️ 封存年度 (Parquet)")
+        archived = get_archive().stats()
+        if archived: st.dataframe(pd.DataFrame(archived), use_container_width=True, hide_index=True)
+        else: st.caption("未有封存資料，live sheet 保留晒所有年度")
+        st.caption(f"📁 {ARCHIVE_DIR} (封存後舊行會由 Google Sheet 刪走，呢個資料夾要喺持久 disk 兼有備份)")
+        if not ARCHIVE_ENABLED: st.caption("🔒 未開封存：要喺 secrets [storage] 設定 archive_dir (持久 disk) 或者 archive_auto = \"1\" 先可以封存")
+        elif st.button("🗄️ 封存已完結年度"):
+            moved = archive_closed_periods()
+            st.toast(f"已封存: {moved}" if moved else "冇需要封存嘅資料", icon="🗄️"); st.rerun()
+        if wq.errors:
+            st.markdown("### ⚠️ 放棄咗嘅寫入")
+            st.dataframe(pd.DataFrame(wq.errors, columns=['at', 'kind', 'sheet', 'key', 'error']), use_container_width=True, hide_index=True)
+        snap['sheet_pool'] = pool_stats; snap['write_queue'] = {"pending": len(wq.ops), "errors": [list(e) for e in wq.errors]}
+        st.download_button("📥 匯出 Metrics (JSON)", json.dumps(snap, ensure_ascii=False, indent=2), file_name=f"tim_team_metrics_{datetime.date.today()}.json", mime="application/json")
+
+get_metrics().rerun(menu if st.session_state['logged_in'] else "login", (time.perf_counter() - RUN_STARTED) * 1000)
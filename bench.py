@@ -0,0 +1,264 @@
+# 效能基準：用假資料 + 離線假 Google Sheet，量度 app.py 主要資料路徑喺唔同規模下嘅時間同記憶體
+# 用法：python bench.py [--scales small,medium,large] [--backend sheets] [--latency 0] [--out results.json]
+import argparse
+import base64
+import datetime
+import io
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SCALES = {
+    "small": {"users": 10, "activities": 2000, "years": 1, "stories": 100},
+    "medium": {"users": 30, "activities": 20000, "years": 3, "stories": 1000},
+    "large": {"users": 80, "activities": 100000, "years": 5, "stories": 5000},
+}
+REPEAT = 5
+
+# --- 假 Google Sheet (只實作 app.py 用到嘅 gspread API) ---
+CALLS = {}
+
+class FakeWorksheet:
+    _ids = 0
+
+    def __init__(self, spreadsheet, title):
+        FakeWorksheet._ids += 1
+        self.spreadsheet, self.title, self.id, self.rows = spreadsheet, title, FakeWorksheet._ids, []
+
+    def _call(self, verb):
+        CALLS[f"{self.title}.{verb}"] = CALLS.get(f"{self.title}.{verb}", 0) + 1
+        if self.spreadsheet.latency: time.sleep(self.spreadsheet.latency)
+
+    def _grid(self, a1):
+        from gspread.utils import a1_range_to_grid_range
+        g = a1_range_to_grid_range(a1.split("!")[-1])
+        return g.get("startRowIndex", 0), g.get("endRowIndex", len(self.rows)), g.get("startColumnIndex", 0), g.get("endColumnIndex", None)
+
+    def _read(self, a1=None):
+        if a1 is None: return [list(r) for r in self.rows]
+        r0, r1, c0, c1 = self._grid(a1)
+        return [list(r[c0:c1]) for r in self.rows[r0:r1]]
+
+    def _write(self, a1, values):
+        r0, _, c0, _ = self._grid(a1)
+        for i, row in enumerate(values):
+            while len(self.rows) <= r0 + i: self.rows.append([])
+            target = self.rows[r0 + i]
+            for j, v in enumerate(row):
+                while len(target) <= c0 + j: target.append("")
+                target[c0 + j] = str(v)
+
+    def get_all_records(self, **kwargs):
+        from gspread.utils import numericise_all
+        self._call("get_all_records")
+        if not self.rows: return []
+        h = self.rows[0]
+        return [dict(zip(h, numericise_all((r + [""] * len(h))[:len(h)]))) for r in self.rows[1:]]
+
+    def get_values(self, a1=None, **kwargs): self._call("get_values"); return self._read(a1)
+
+    def row_values(self, i): self._call("row_values"); return list(self.rows[i - 1]) if len(self.rows) >= i else []
+
+    def col_values(self, i): self._call("col_values"); return [r[i - 1] if len(r) >= i else "" for r in self.rows]
+
+    def append_row(self, values, **kwargs): return self.append_rows([values])
+
+    def append_rows(self, values, **kwargs):
+        from gspread.utils import rowcol_to_a1
+        self._call("append_rows")
+        start = len(self.rows) + 1
+        self.rows += [[str(v) for v in row] for row in values]
+        return {"updates": {"updatedRange": f"{self.title}!A{start}:{rowcol_to_a1(len(self.rows), max(len(r) for r in values))}"}}
+
+    def batch_update(self, data, **kwargs):
+        self._call("batch_update")
+        for d in data: self._write(d["range"], d["values"])
+        return {}
+
+class FakeSpreadsheet:
+    def __init__(self, latency=0.0): self.sheets, self.latency = {}, latency
+
+    def _call(self, verb):
+        CALLS[verb] = CALLS.get(verb, 0) + 1
+        if self.latency: time.sleep(self.latency)
+
+    def worksheet(self, title):
+        from gspread.exceptions import WorksheetNotFound
+        self._call("worksheet")
+        if title not in self.sheets: raise WorksheetNotFound(title)
+        return self.sheets[title]
+
+    def worksheets(self): self._call("worksheets"); return list(self.sheets.values())
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        self._call("add_worksheet")
+        self.sheets[title] = FakeWorksheet(self, title)
+        return self.sheets[title]
+
+    def values_batch_get(self, ranges, params=None):
+        self._call("values_batch_get")
+        out = []
+        for r in ranges:
+            title, _, a1 = r.partition("!")
+            ws = self.sheets[title.strip("'")]
+            out.append({"range": r, "values": ws._read(a1 or None)})
+        return {"valueRanges": out}
+
+    def values_batch_update(self, body=None):
+        self._call("values_batch_update")
+        for d in body["data"]:
+            title, _, a1 = d["range"].partition("!")
+            self.sheets[title.strip("'")]._write(a1, d["values"])
+        return {}
+
+    def batch_update(self, body):
+        self._call("batch_update")
+        by_id = {ws.id: ws for ws in self.sheets.values()}
+        for req in body.get("requests", []):
+            rng = req["deleteDimension"]["range"]
+            del by_id[rng["sheetId"]].rows[rng["startIndex"]:rng["endIndex"]]
+        return {}
+
+class FakeClient:
+    def __init__(self, spreadsheet): self.spreadsheet = spreadsheet
+
+    def open(self, name): self.spreadsheet._call("open"); return self.spreadsheet
+
+# --- 假資料 ---
+SURNAMES = ["陳", "李", "張", "黃", "何", "林", "吳", "劉", "鄭", "梁"]
+PLACES = ["觀塘", "旺角", "沙田", "荃灣", "中環", "銅鑼灣", "將軍澳", "屯門"]
+PLANS = ["危疾保", "醫療保", "儲蓄計劃", "年金", "MPF", "人壽保"]
+NOTES = [
+    "同{name}喺{place}飲咖啡，佢話老闆冇買{plan}，驚一病就冇晒積蓄。",
+    "{name}今日終於肯睇{plan}建議書，下星期再約佢同老婆一齊傾。",
+    "約咗{name}食lunch，佢對轉行有興趣，下次帶佢嚟Team Dinner。",
+    "幫{name}做Fact Find，屋企兩個細路，最擔心供樓同{plan}唔夠。",
+    "{name}簽咗{plan}！多謝Tim教嘅異議處理，佢最後話「早知早啲買」。",
+]
+STORY_TITLES = ["IT中層確診癌症", "自僱師傅工傷", "新手媽媽住院", "退休前一年中風", "MPF唔夠用"]
+
+def fake_avatar(rng, size=256):
+    from PIL import Image
+    img = Image.new("RGB", (size, size), tuple(rng.randrange(256) for _ in range(3)))
+    buf = io.BytesIO(); img.save(buf, format="JPEG", quality=80)
+    return f"data:image/jpeg;base64,{base64.b64encode(buf.getvalue()).decode()}"
+
+def fake_note(rng):
+    return rng.choice(NOTES).format(name=rng.choice(SURNAMES) + rng.choice(["生", "小姐", "太"]), place=rng.choice(PLACES), plan=rng.choice(PLANS))
+
+def generate(spec, seed=2026):
+    rng = random.Random(seed)
+    import app
+    today = datetime.date.today()
+    users = [["Admin", "admin123", "Leader", "Management", 0, fake_avatar(rng), ""]]
+    users += [[f"Agent{i:03d}", "1234", "Member", rng.choice(["Alpha", "Beta"]), rng.randint(0, 5), fake_avatar(rng), str(today - datetime.timedelta(days=rng.randint(0, 30)))] for i in range(spec["users"])]
+    names = [u[0] for u in users[1:]]
+    days = 365 * spec["years"]
+    acts = []
+    for i in range(spec["activities"]):
+        d = today - datetime.timedelta(days=rng.randint(0, days))
+        t = rng.choice(app.ACTIVITY_TYPES)
+        ts = datetime.datetime.combine(d, datetime.time(rng.randint(8, 22), rng.randint(0, 59), rng.randint(0, 59), rng.choice([0, rng.randint(1, 999999)])))
+        acts.append([i + 1, rng.choice(names), str(d), t, int(re.search(r"\((\d+)分\)", t).group(1)), fake_note(rng), str(ts)])
+    acts.sort(key=lambda r: r[6])
+    for i, r in enumerate(acts): r[0] = i + 1
+    months = sorted({str(today - datetime.timedelta(days=30 * k))[:7] for k in range(12 * spec["years"])})
+    fyc = [[i + 1, n, m, rng.randint(0, 60000)] for i, (n, m) in enumerate((n, m) for n in names for m in months)]
+    stories = [[i + 1, rng.choice(names), str(today - datetime.timedelta(days=rng.randint(0, days))), rng.choice(PLANS), f"{rng.choice(STORY_TITLES)} #{i}",
+                fake_note(rng), fake_note(rng) + fake_note(rng), fake_note(rng), fake_note(rng), rng.choice(PLACES), str(today)] for i in range(spec["stories"])]
+    return {"users": users, "activities": acts, "monthly_fyc": fyc, "story_ammo": stories}
+
+# --- 量度 ---
+# cold = 第一次 call (連 cache 建立，喺 tracemalloc 底下量，所以會慢少少)；warm = 之後幾次嘅中位數
+def measure(fn, repeat=REPEAT):
+    tracemalloc.start()
+    t = time.perf_counter(); fn(); cold = time.perf_counter() - t
+    _, peak = tracemalloc.get_traced_memory(); tracemalloc.stop()
+    warm = []
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(); warm.append(time.perf_counter() - t)
+    return {"cold_ms": round(cold * 1000, 3), "warm_ms": round(statistics.median(warm) * 1000, 3), "peak_kb": round(peak / 1024, 1)}
+
+def run_scale(name, backend, latency):
+    spec = SCALES[name]
+    work = tempfile.mkdtemp(prefix="tim-bench-")
+    os.chdir(work)
+    os.makedirs(".streamlit", exist_ok=True)
+    with open(".streamlit/secrets.toml", "w") as f: f.write('[service_account]\nkey_content = "{}"\n')
+    os.environ.update({"TIM_BACKEND": backend, "TIM_REPLICA_PATH": os.path.join(work, "replica.db"), "TIM_SQLITE_PATH": os.path.join(work, "tim.db")})
+    import logging; logging.disable(logging.WARNING)
+    import gspread
+    from google.oauth2 import service_account
+    sh = FakeSpreadsheet()
+    service_account.Credentials.from_service_account_info = staticmethod(lambda *a, **k: object())
+    gspread.authorize = lambda *a, **k: FakeClient(sh)
+    sys.path.insert(0, APP_DIR)
+    import app
+    app.init_db(app.SCHEMA_VERSION).join()
+    data = generate(spec)
+    t = time.perf_counter()
+    if backend == "sheets":
+        for title, rows in data.items(): sh.sheets[title].rows = [list(app.SCHEMAS[title])] + [[str(v) for v in r] for r in rows]
+        for title in data: app.sync_sheet(title, full=True)
+    else:
+        b = app.get_backend()
+        for title, rows in data.items():
+            for r in rows: b.insert(title, {c: v for c, v in zip(app.SCHEMAS[title], r) if c != "id"})
+    setup = time.perf_counter() - t
+    sh.latency = latency
+    CALLS.clear()
+    user = "Agent000"
+    month = str(datetime.date.today())[:7]
+    cases = {
+        "read_data.activities": lambda: app.read_data("activities"),
+        "read_data.users": lambda: app.read_data("users"),
+        "get_data.yearly": lambda: app.get_data("Yearly"),
+        "get_data.month": lambda: app.get_data(month),
+        "get_weekly_data": lambda: app.get_weekly_data(),
+        "get_all_act": lambda: app.get_all_act(),
+        "get_feed_page": lambda: app.get_feed_page(app.get_clean_users(), [], app.FEED_PAGE_SIZE),
+        "check_notifications": lambda: app.unread_notifications(user),
+        "story_filter.all": lambda: app.search_stories(),
+        "story_filter.keyword": lambda: app.search_stories("危疾 癌症"),
+        "story_filter.latin": lambda: app.search_stories("mpf"),
+    }
+    results = {k: measure(fn) for k, fn in cases.items()}
+    # 一次寫入之後嘅重算 (incremental 路徑)
+    def write_then_read():
+        app.add_act(user, datetime.date.today(), app.ACTIVITY_TYPES[0], "bench")
+        app.get_data("Yearly"); app.get_weekly_data(); app.unread_notifications(user)
+    results["add_act+reads"] = measure(write_then_read)
+    app.get_write_queue().flush()
+    return {"scale": name, "spec": spec, "backend": backend, "latency_ms": latency * 1000, "setup_s": round(setup, 3), "sheets_calls": dict(CALLS), "results": results}
+
+def main():
+    p = argparse.ArgumentParser(description="TIM TEAM data-path benchmark")
+    p.add_argument("--scales", default="small,medium")
+    p.add_argument("--backend", default="sheets", choices=["sheets", "sqlite", "memory"])
+    p.add_argument("--latency", type=float, default=0.0, help="每個假 Sheets API call 嘅延遲 (ms)")
+    p.add_argument("--out", help="JSON 輸出檔 (預設印去 stdout)")
+    p.add_argument("--child", help=argparse.SUPPRESS)
+    args = p.parse_args()
+    if args.child:
+        print(json.dumps(run_scale(args.child, args.backend, args.latency / 1000), ensure_ascii=False)); return
+    # 每個規模一個新 process，cache / 背景 thread 互不影響
+    runs = []
+    for name in args.scales.split(","):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name, "--backend", args.backend, "--latency", str(args.latency)], capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        print(f"{name}: " + ", ".join(f"{k} {v['warm_ms']}ms" for k, v in runs[-1]["results"].items()), file=sys.stderr)
+    report = {"generated_at": str(datetime.datetime.now()), "python": sys.version.split()[0], "runs": runs}
+    if args.out:
+        with open(args.out, "w") as f: json.dump(report, f, ensure_ascii=False, indent=2)
+    else: print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()